@@ -1,7 +1,8 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from app.api.schemas import FolderCreate, MaterialOut, MaterialUpdate, VoteData
+from app.api.schemas import CopySet, FolderCopyOut, FolderCreate, MaterialBulkOut, MaterialBulkRequest, MaterialChangesOut, MaterialOut, MaterialUpdate, VoteData
 from app.core.security import get_current_user, validate_csrf
 from app.db.database import get_db
 from app.db.models import User
@@ -17,6 +18,15 @@ def get_all_materials(db: Session = Depends(get_db), current_user: User = Depend
     materials = material_repository.get_all_materials_for_user(db, current_user.id)
     return materials
 
+@router.get("/materials/changes", response_model=MaterialChangesOut)
+def get_material_changes(
+    since: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    material_service: MaterialService = Depends(MaterialService),
+):
+    return material_service.get_material_changes(db, current_user, since)
+
 @router.post("/folders", status_code=status.HTTP_201_CREATED)
 def create_new_folder(
     folder_data: FolderCreate, 
@@ -27,6 +37,24 @@ def create_new_folder(
 ):
     return material_service.create_folder(db, folder_data, current_user)
 
+@router.post("/folders/{folder_id}/copy", status_code=status.HTTP_201_CREATED, response_model=FolderCopyOut)
+def copy_folder(
+    folder_id: int,
+    copy_data: CopySet,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    material_service: MaterialService = Depends(MaterialService),
+    _ = Depends(validate_csrf),
+):
+    try:
+        return material_service.copy_folder(db, folder_id, copy_data, current_user)
+    except NotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.detail)
+    except PermissionDeniedError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=e.detail)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.detail)
+
 @router.patch("/materials/{item_id}", response_model=MaterialOut)
 def update_material(
     item_id: int, 
@@ -45,6 +73,16 @@ def update_material(
     except ValidationError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.detail)
 
+@router.post("/materials/bulk", status_code=status.HTTP_200_OK, response_model=MaterialBulkOut)
+def bulk_update_materials(
+    bulk_data: MaterialBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    material_service: MaterialService = Depends(MaterialService),
+    _ = Depends(validate_csrf),
+):
+    return material_service.bulk_update_materials(db, bulk_data, current_user)
+
 @router.delete("/materials/{item_id}", status_code=status.HTTP_200_OK, response_model=list[int])
 def delete_material(
     item_id: int, 
@@ -1,54 +1,38 @@
-from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
 from typing import Optional
-from bs4 import BeautifulSoup
-from elasticsearch import Elasticsearch
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
-from sqlalchemy import and_, case, func, text
-from sqlalchemy.orm import Session, joinedload
-from typing import Optional
-from elasticsearch import Elasticsearch
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
-from app.api.schemas import BasePublicSetOut, CopySet, FlashcardSetOut, FlashcardSetUpdate, FlashcardSetUpdateAndCreate, MaterialOut, MostLikedSetsOut, MostViewedSetsOut, PublicSetSearchOut, TimePeriod
+from app.api.schemas import BasePublicSetOut, CopySet, FlashcardPageOut, FlashcardSetOut, FlashcardSetUpdate, FlashcardSetUpdateAndCreate, MaterialOut, MostLikedSetsOut, MostViewedSetsOut, PublicSetSearchOut, PublicSetSearchPageOut, SearchSuggestionsOut, TimePeriod, TrendingSetsOut
 from app.core.security import get_current_user, get_optional_current_user, validate_csrf
 from app.db.database import get_db
 from app.db.models import User
-from app.external.elastic import get_es_client
-from app.services.exceptions import NotFoundError, PermissionDeniedError, ServiceError
-from app.services.flashcard_set_service import FlashcardSetService
+from app.services.exceptions import NotFoundError, PermissionDeniedError, ServiceError, ValidationError
+from app.services.flashcard_set_service import FLASHCARD_PAGE_SIZE, MAX_FLASHCARD_PAGE_SIZE, FlashcardSetService
+from app.services.leaderboard_service import LeaderboardService
 from app.services.material_service import MaterialService
-from app.services.public_service import PublicSetService
+from app.services.public_service import MAX_SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE, PublicSetService
+from app.services.trending_service import TrendingService
+from app.services.view_event_pipeline import anonymous_fingerprint
 
 router = APIRouter(tags=["Flashcard Sets"])
 
 @router.post("/sets", status_code=status.HTTP_201_CREATED, response_model=MaterialOut)
 def create_new_set(
     set_data: FlashcardSetUpdateAndCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    elastic_search: Elasticsearch = Depends(get_es_client),
     set_service: FlashcardSetService = Depends(FlashcardSetService),
     _ = Depends(validate_csrf),
 ):
-    new_material = set_service.create_set(db, set_data, current_user)
-    
-    background_tasks.add_task(
-        set_service.generate_and_save_tags_bg,
-        set_id=new_material.id,
-        elastic_search=elastic_search,
-    )
-    return new_material
+    return set_service.create_set(db, set_data, current_user)
 
 @router.patch("/sets/{set_id}", status_code=status.HTTP_200_OK, response_model=MaterialOut)
 def update_set(
     set_id: int,
     update_set_data: FlashcardSetUpdate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    elastic_search: Elasticsearch = Depends(get_es_client),
     set_service: FlashcardSetService = Depends(FlashcardSetService),
     material_service: MaterialService = Depends(MaterialService),
     _ = Depends(validate_csrf),
@@ -59,25 +43,27 @@ def update_set(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.detail)
     except PermissionDeniedError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=e.detail)
-
-    background_tasks.add_task(
-        set_service.generate_and_save_tags_bg,
-        set_id=set_material.id,
-        elastic_search=elastic_search,
-    )
     return set_material
 
 @router.get("/sets/{set_id}", response_model=FlashcardSetOut)
 def get_set(
     set_id: int,
-    background_tasks: BackgroundTasks,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_optional_current_user),
     set_service: FlashcardSetService = Depends(FlashcardSetService),
     material_service: MaterialService = Depends(MaterialService)
 ):
     try:
-        return set_service.get_full_set_details(db, set_id, current_user, material_service, background_tasks)
+        fingerprint = None
+        if current_user is None:
+            fingerprint = anonymous_fingerprint(
+                request.client.host if request.client else None, request.headers.get("user-agent")
+            )
+        set_out, etag = set_service.get_full_set_details(
+            db, set_id, current_user, request.headers.get("if-none-match"), material_service, fingerprint
+        )
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.detail)
     except PermissionDeniedError as e:
@@ -86,6 +72,30 @@ def get_set(
         print(f"Unexpected error in get_set: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An internal error occurred")
 
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if set_out is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    response.headers.update(cache_headers)
+    return set_out
+
+@router.get("/sets/{set_id}/flashcards", response_model=FlashcardPageOut)
+def get_set_flashcards(
+    set_id: int,
+    after: Optional[int] = None,
+    limit: int = Query(FLASHCARD_PAGE_SIZE, ge=1, le=MAX_FLASHCARD_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_current_user),
+    set_service: FlashcardSetService = Depends(FlashcardSetService),
+    material_service: MaterialService = Depends(MaterialService)
+):
+    try:
+        return set_service.get_flashcards_page(db, set_id, current_user, after, limit, material_service)
+    except NotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.detail)
+    except PermissionDeniedError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=e.detail)
+
 @router.post("/sets/{set_id}/copy", response_model=MaterialOut, status_code=status.HTTP_201_CREATED)
 def copy_flashcard_set(
     set_id: int, 
@@ -106,37 +116,85 @@ def copy_flashcard_set(
 @router.get("/public/sets/most_viewed", response_model=list[MostViewedSetsOut])
 def get_most_viewed_sets(
     period: TimePeriod, 
+    response: Response,
     db: Session = Depends(get_db),
-    public_set_service: PublicSetService = Depends(PublicSetService),
+    leaderboard_service: LeaderboardService = Depends(LeaderboardService),
 ):
     try:
-        return public_set_service.get_most_viewed(db, period)
+        results, computed_at = leaderboard_service.get_most_viewed(db, period)
     except ServiceError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.detail)
+    response.headers["Last-Modified"] = format_datetime(computed_at, usegmt=True)
+    return results
 
 @router.get("/public/sets/most_liked", response_model=list[MostLikedSetsOut])
 def get_most_liked_sets(
     period: TimePeriod, 
+    response: Response,
     db: Session = Depends(get_db),
-    public_set_service: PublicSetService = Depends(PublicSetService),
+    leaderboard_service: LeaderboardService = Depends(LeaderboardService),
+):
+    results, computed_at = leaderboard_service.get_most_liked(db, period)
+    response.headers["Last-Modified"] = format_datetime(computed_at, usegmt=True)
+    return results
+
+@router.get("/public/sets/trending", response_model=list[TrendingSetsOut])
+def get_trending_sets(
+    db: Session = Depends(get_db),
+    trending_service: TrendingService = Depends(TrendingService),
 ):
-    return public_set_service.get_most_liked(db, period)
+    return trending_service.get_trending(db)
 
 @router.get("/public/sets/recently_created", response_model=list[BasePublicSetOut])
 def get_recently_created_sets(
+    response: Response,
     db: Session = Depends(get_db),
+    leaderboard_service: LeaderboardService = Depends(LeaderboardService),
+):
+    results, computed_at = leaderboard_service.get_recently_created(db)
+    response.headers["Last-Modified"] = format_datetime(computed_at, usegmt=True)
+    return results
+
+@router.get("/public/search", response_model=PublicSetSearchPageOut)
+async def search_public_sets_page(
+    q: str,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    public_set_service: PublicSetService = Depends(PublicSetService),
+):
+    try:
+        page = await public_set_service.search_public_sets_page(q, cursor, limit)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.detail)
+    except ServiceError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.detail)
+    if page.degraded:
+        response.headers["Cache-Control"] = "no-store"
+    return page
+
+@router.get("/public/search/suggest", response_model=SearchSuggestionsOut)
+async def suggest_public_sets(
+    q: str,
+    response: Response,
     public_set_service: PublicSetService = Depends(PublicSetService),
 ):
-    return public_set_service.get_recently_created(db)
+    try:
+        suggestions = await public_set_service.suggest(q)
+    except ServiceError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.detail)
+    if suggestions.degraded:
+        response.headers["Cache-Control"] = "no-store"
+    return suggestions
 
 @router.post("/public/search", response_model=list[PublicSetSearchOut])
-def search_public_sets(
+async def search_public_sets(
     text_query: str,
     public_set_service: PublicSetService = Depends(PublicSetService),
 ):
     if not text_query:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search query cannot be empty")
     try:
-        return public_set_service.search_public_sets(text_query)
+        return await public_set_service.search_public_sets(text_query)
     except ServiceError as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.detail)
\ No newline at end of file
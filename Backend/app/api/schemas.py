@@ -2,7 +2,7 @@ from datetime import datetime
 import enum
 from typing import Annotated, Optional
 
-from pydantic import AfterValidator, BaseModel, ConfigDict, EmailStr
+from pydantic import AfterValidator, BaseModel, ConfigDict, EmailStr, Field
 
 from app.db.models import VoteTypeEnum, PermissionEnum, VoteTypeEnum
 from app.core.security import sanitize_html
@@ -39,10 +39,39 @@ class MaterialOut(BaseModel):
     class Config:
         orm_mode = True
 
+class MaterialChangesOut(BaseModel):
+    upserts: list[MaterialOut]
+    deleted_ids: list[int]
+    cursor: int
+
 class MaterialUpdate(BaseModel):
     parent_id: Optional[int] = None
     name: Optional[SanitizedStr] = None
 
+class BulkActionEnum(str, enum.Enum):
+    move="move"
+    rename="rename"
+    delete="delete"
+
+class MaterialBulkOperation(BaseModel):
+    id: int
+    action: BulkActionEnum
+    parent_id: Optional[int] = None
+    name: Optional[SanitizedStr] = None
+
+class MaterialBulkRequest(BaseModel):
+    operations: list[MaterialBulkOperation] = Field(min_length=1, max_length=1000)
+
+class MaterialBulkResult(BaseModel):
+    id: int
+    action: BulkActionEnum
+    success: bool
+    detail: Optional[str] = None
+    deleted_ids: list[int] = []
+
+class MaterialBulkOut(BaseModel):
+    results: list[MaterialBulkResult]
+
 class FolderCreate(BaseModel):
     name: SanitizedStr
     parent_id: Optional[int] = None
@@ -100,12 +129,19 @@ class FlashcardSetOut(BaseModel):
     is_public: bool
     creator: SanitizedStr
     flashcards: list[FlashcardData]
+    flashcard_count: int
+    next_cursor: Optional[int] = None
+    version: int
     shared_with: list[SharedUser]
     upvotes: int
     downvotes: int
     user_vote: Optional[VoteTypeEnum] = None
     comments_data: CommentsDataOut
 
+class FlashcardPageOut(BaseModel):
+    flashcards: list[FlashcardData]
+    next_cursor: Optional[int] = None
+
 class ShareData(BaseModel):
     email: SanitizedStr
     permission: PermissionEnum
@@ -135,6 +171,13 @@ class CommentUpdate(BaseModel):
 class CopySet(BaseModel):
     target_folder_id: Optional[int] = None
 
+class FolderCopyOut(BaseModel):
+    root: MaterialOut
+    folders_copied: int
+    sets_copied: int
+    flashcards_copied: int
+    materials_skipped: int
+
 class BasePublicSetOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -150,6 +193,9 @@ class MostViewedSetsOut(BasePublicSetOut):
 class MostLikedSetsOut(BasePublicSetOut):
     like_count: int
 
+class TrendingSetsOut(BasePublicSetOut):
+    trending_score: float
+
 class LastViewedSet(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -166,6 +212,20 @@ class PublicSetSearchOut(BasePublicSetOut):
 
     tags: list[str] = []
 
+class PublicSetSearchHitOut(PublicSetSearchOut):
+    highlights: dict[str, list[SanitizedStr]] = {}
+
+class SearchSuggestionsOut(BaseModel):
+    suggestions: list[SanitizedStr]
+    degraded: bool = False
+
+class PublicSetSearchPageOut(BaseModel):
+    results: list[PublicSetSearchHitOut]
+    total: int
+    total_is_lower_bound: bool
+    next_cursor: Optional[str] = None
+    degraded: bool = False
+
 class UserMeResponse(BaseModel):
     user: UserOut
     csrf_token: str
\ No newline at end of file
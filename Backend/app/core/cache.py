@@ -0,0 +1,60 @@
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+from cachetools import LRUCache
+from opentelemetry import metrics
+
+meter = metrics.get_meter(__name__)
+cache_hits = meter.create_counter("cache.hits", description="Cache lookups that found a usable entry")
+cache_misses = meter.create_counter("cache.misses", description="Cache lookups that found nothing usable")
+cache_evictions = meter.create_counter("cache.evictions", description="Entries evicted to stay under the size limit")
+
+class _EvictionCountingLRUCache(LRUCache):
+    def __init__(self, maxsize: int, getsizeof: Callable, on_evict: Callable):
+        super().__init__(maxsize=maxsize, getsizeof=getsizeof)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_evict()
+        return item
+
+class SizedLRUCache:
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self._lock = Lock()
+        self._cache = _EvictionCountingLRUCache(
+            maxsize=max_bytes,
+            getsizeof=lambda entry: entry[1],
+            on_evict=self._record_eviction,
+        )
+
+    def _record_eviction(self):
+        cache_evictions.add(1, {"cache": self.name})
+
+    def get(self, key: Hashable, is_fresh: Callable[[Any], bool] | None = None) -> Any | None:
+        value = self.peek(key)
+        if value is not None and is_fresh is not None and not is_fresh(value):
+            value = None
+        self.record_lookup(value is not None)
+        return value
+
+    def peek(self, key: Hashable) -> Any | None:
+        # Looks up without touching the metrics, for callers that only know later whether the entry is usable
+        with self._lock:
+            entry = self._cache.get(key)
+            return entry[0] if entry is not None else None
+
+    def record_lookup(self, hit: bool):
+        if hit:
+            cache_hits.add(1, {"cache": self.name})
+        else:
+            cache_misses.add(1, {"cache": self.name})
+
+    def set(self, key: Hashable, value: Any, size: int):
+        with self._lock:
+            try:
+                self._cache[key] = (value, size)
+            except ValueError:
+                # A single value bigger than the whole cache is never stored
+                pass
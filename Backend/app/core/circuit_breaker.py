@@ -0,0 +1,120 @@
+import functools
+import inspect
+import time
+from threading import Lock
+from typing import Callable
+
+from opentelemetry import metrics
+
+meter = metrics.get_meter(__name__)
+breaker_rejections = meter.create_counter("circuit_breaker.rejected", description="Calls failed fast by an open breaker")
+breaker_opened = meter.create_counter("circuit_breaker.opened", description="Times a breaker tripped open")
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__(f"{name} is unavailable")
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout_seconds: float,
+        is_failure: Callable[[Exception], bool] = lambda e: True,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.is_failure = is_failure
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self._lock = Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open lets a single probe through, its result decides the next state.
+            # A probe that never reported back is given up on after the reset timeout.
+            now = time.monotonic()
+            probe_expired = now - self._probe_started_at >= self.reset_timeout_seconds
+            if self.state == self.HALF_OPEN and (not self._probe_in_flight or probe_expired):
+                self._probe_in_flight = True
+                self._probe_started_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"Circuit breaker {self.name} closed")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"Circuit breaker {self.name} opened after {self._failures} failures")
+                    breaker_opened.add(1, {"breaker": self.name})
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def _before_call(self):
+        if not self.allow_request():
+            breaker_rejections.add(1, {"breaker": self.name})
+            raise CircuitOpenError(self.name)
+
+    def _after_error(self, e: BaseException):
+        # Cancellation and other BaseExceptions tell nothing about the dependency but must still end a probe
+        if not isinstance(e, Exception) or self.is_failure(e):
+            self.record_failure()
+        else:
+            # The dependency answered, the request itself was bad
+            self.record_success()
+
+    def call(self, func: Callable, *args, **kwargs):
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._after_error(e)
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, func: Callable, *args, **kwargs):
+        self._before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self._after_error(e)
+            raise
+        self.record_success()
+        return result
+
+    def protect(self, func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.call_async(func, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapper
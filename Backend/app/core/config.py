@@ -20,6 +20,34 @@ class Settings(BaseSettings):
 
     GEMINI_API_KEY: str
 
+    SET_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    LEADERBOARD_REFRESH_SECONDS: int = 60
+    TRENDING_HALF_LIFE_HOURS: float = 24
+    TRENDING_DECAY_INTERVAL_SECONDS: int = 3600
+    PUBLIC_RESPONSE_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    SEARCH_OUTBOX_BATCH_SIZE: int = 200
+    SEARCH_OUTBOX_POLL_SECONDS: float = 1.0
+    SEARCH_OUTBOX_LEASE_SECONDS: int = 600
+    VIEW_EVENT_QUEUE_SIZE: int = 10000
+    VIEW_EVENT_BATCH_SIZE: int = 500
+    VIEW_EVENT_FLUSH_SECONDS: float = 2.0
+    VIEW_DEDUP_WINDOW_SECONDS: int = 30 * 60
+    VIEW_DEDUP_MAX_ENTRIES: int = 200_000
+    ANONYMOUS_VIEW_SAMPLE_RATE: float = 1.0
+    VIEW_EVENTS_ROLLOVER_DAYS: int = 30
+    VIEW_EVENTS_RETENTION_DAYS: int = 90
+    VIEW_ROLLUP_INTERVAL_SECONDS: int = 3600
+    RECENT_SETS_PER_USER: int = 20
+    ES_CONNECTIONS_PER_NODE: int = 25
+    ES_REQUEST_TIMEOUT_SECONDS: float = 10
+    ES_SEARCH_TIMEOUT_SECONDS: float = 2
+    ES_SUGGEST_TIMEOUT_SECONDS: float = 0.5
+    ES_BULK_TIMEOUT_SECONDS: float = 30
+    ES_MAX_RETRIES: int = 2
+    ES_BREAKER_FAILURE_THRESHOLD: int = 5
+    ES_BREAKER_RESET_SECONDS: float = 30
+    ES_SETUP_RETRY_SECONDS: int = 30
+
     model_config = SettingsConfigDict(env_file="../.env", extra="ignore")
 
 
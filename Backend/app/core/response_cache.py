@@ -0,0 +1,109 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+
+from app.core.cache import SizedLRUCache
+
+# Hop-by-hop and per-response headers that must not be replayed from the cache
+_SKIPPED_HEADERS = {"content-length", "set-cookie", "date", "age", "cache-control"}
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: list[tuple[str, str]]
+    body: bytes
+    stored_at: float
+
+class PublicResponseCacheMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, route_ttls: dict[str, int], max_bytes: int):
+        super().__init__(app)
+        self.route_ttls = route_ttls
+        self.cache = SizedLRUCache("public_responses", max_bytes)
+        self._inflight: dict[tuple, asyncio.Future] = {}
+
+    def _cache_key(self, request: Request) -> tuple:
+        params = sorted((key, value.strip()) for key, value in request.query_params.multi_items())
+        return (request.method, request.url.path, tuple(params))
+
+    def _get_fresh(self, key: tuple, ttl: int) -> CachedResponse | None:
+        return self.cache.get(key, is_fresh=lambda cached: time.time() - cached.stored_at < ttl)
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        ttl = self.route_ttls.get(request.url.path)
+        if ttl is None or request.method != "GET":
+            return await call_next(request)
+
+        if "access_token" in request.cookies:
+            response = await call_next(request)
+            response.headers["Cache-Control"] = "private, no-store"
+            response.headers["Vary"] = "Cookie"
+            return response
+
+        key = self._cache_key(request)
+        cached = self._get_fresh(key, ttl)
+        if cached is not None:
+            return self._build_response(cached, ttl)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                cached = await asyncio.shield(inflight)
+            except Exception:
+                cached = None
+            if cached is not None:
+                return self._build_response(cached, ttl)
+            return await call_next(request)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await call_next(request)
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            cached = CachedResponse(
+                status_code=response.status_code,
+                headers=[
+                    (name, value) for name, value in response.headers.items()
+                    if name.lower() not in _SKIPPED_HEADERS
+                ],
+                body=body,
+                stored_at=time.time(),
+            )
+            # Degraded responses opt out with no-store so they are not served after recovery
+            cacheable = response.status_code == 200 and "no-store" not in response.headers.get("cache-control", "")
+            if cacheable:
+                self.cache.set(key, cached, size=len(body))
+                future.set_result(cached)
+            else:
+                future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting on the future, so mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            # A cancelled leader resolves nothing above; followers then fetch on their own
+            if not future.done():
+                future.set_result(None)
+            self._inflight.pop(key, None)
+
+        if not cacheable:
+            return Response(
+                content=body,
+                status_code=response.status_code,
+                headers={name: value for name, value in response.headers.items() if name.lower() != "content-length"},
+            )
+        return self._build_response(cached, ttl)
+
+    def _build_response(self, cached: CachedResponse, ttl: int) -> Response:
+        response = Response(
+            content=cached.body,
+            status_code=cached.status_code,
+            headers=dict(cached.headers),
+        )
+        response.headers["Cache-Control"] = f"public, max-age={ttl}"
+        response.headers["Age"] = str(int(time.time() - cached.stored_at))
+        response.headers["Vary"] = "Cookie"
+        return response
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Callable
+
+class PeriodicJob:
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], None]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        while True:
+            try:
+                # Jobs use the sync DB session and ES client, so keep them off the event loop
+                await asyncio.to_thread(self.func)
+            except Exception as e:
+                print(f"Scheduled job {self.name} failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+scheduled_jobs: list[PeriodicJob] = []
+
+def register_job(name: str, interval_seconds: float, func: Callable[[], None]) -> PeriodicJob:
+    job = PeriodicJob(name, interval_seconds, func)
+    scheduled_jobs.append(job)
+    return job
+
+def start_scheduled_jobs():
+    for job in scheduled_jobs:
+        job.start()
+    print(f"Started {len(scheduled_jobs)} scheduled jobs")
+
+async def stop_scheduled_jobs():
+    for job in scheduled_jobs:
+        await job.stop()
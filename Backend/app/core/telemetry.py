@@ -1,4 +1,7 @@
-from opentelemetry import trace
+from opentelemetry import metrics, trace
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
@@ -11,9 +14,18 @@ from opentelemetry.instrumentation.elasticsearch import ElasticsearchInstrumento
 from app.db.database import engine
 
 def setup_telemetry(app):
+    setup_providers("Flashcard_backend")
+
+    FastAPIInstrumentor.instrument_app(app)
+    SQLAlchemyInstrumentor().instrument(engine=engine)
+    ElasticsearchInstrumentor().instrument()
+
+    print("OpenTelemetry setup succesfully")
+
+def setup_providers(service_name: str):
 
     resource = Resource(attributes={
-        "service.name": "Flashcard_backend"
+        "service.name": service_name
     })
 
     provider = TracerProvider(resource=resource)
@@ -25,8 +37,7 @@ def setup_telemetry(app):
 
     trace.set_tracer_provider(provider)
 
-    FastAPIInstrumentor.instrument_app(app)
-    SQLAlchemyInstrumentor().instrument(engine=engine)
-    ElasticsearchInstrumentor().instrument()
-
-    print("OpenTelemetry setup succesfully")
\ No newline at end of file
+    metric_reader = PeriodicExportingMetricReader(
+        OTLPMetricExporter(endpoint="http://apm-server:8200/v1/metrics")
+    )
+    metrics.set_meter_provider(MeterProvider(resource=resource, metric_readers=[metric_reader]))
\ No newline at end of file
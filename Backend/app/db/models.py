@@ -27,13 +27,14 @@ class User(Base):
 
 class FlashcardSet(Base):
     __tablename__ = "flashcard_sets"
-    id = Column(Integer, ForeignKey("materials.id"), primary_key=True)
+    id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), primary_key=True)
     description = Column(String, nullable=False)
     is_public = Column(Boolean, nullable=False)
+    version = Column(Integer, nullable=False, default=1)
 
     material = Relationship("Material", back_populates="flashcard_set")
 
-    flashcards = Relationship("Flashcard", back_populates="set", cascade="all, delete-orphan", order_by="Flashcard.id")
+    flashcards = Relationship("Flashcard", back_populates="set", cascade="all, delete-orphan", order_by="Flashcard.id", passive_deletes=True)
     
 class Material(Base):
     __tablename__ = "materials"
@@ -42,24 +43,25 @@ class Material(Base):
     item_type = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    parent_id = Column(Integer, ForeignKey("materials.id"), nullable=True)
-    linked_material_id = Column(Integer, ForeignKey("materials.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), nullable=True)
+    linked_material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), nullable=True)
+    path = Column(LtreeType, nullable=True)
 
     owner = Relationship("User", back_populates="materials")
     
     parent = Relationship("Material", remote_side=[id], back_populates="children", foreign_keys=[parent_id])
-    children = Relationship("Material", back_populates="parent", cascade="all, delete-orphan", foreign_keys=[parent_id])
+    children = Relationship("Material", back_populates="parent", cascade="all, delete-orphan", foreign_keys=[parent_id], passive_deletes=True)
     
-    flashcard_set = Relationship("FlashcardSet", uselist=False, back_populates="material", cascade="all, delete-orphan")
+    flashcard_set = Relationship("FlashcardSet", uselist=False, back_populates="material", cascade="all, delete-orphan", passive_deletes=True)
 
-    comments = Relationship("Comment", back_populates="material", cascade="all, delete-orphan")
+    comments = Relationship("Comment", back_populates="material", cascade="all, delete-orphan", passive_deletes=True)
 
 class Flashcard(Base):
     __tablename__ = "flashcards"
     id = Column(Integer, primary_key=True, index=True)
     front_content = Column(String, nullable=False)
     back_content = Column(String, nullable=False)
-    set_id = Column(Integer, ForeignKey("flashcard_sets.id"), nullable=False)
+    set_id = Column(Integer, ForeignKey("flashcard_sets.id", ondelete="CASCADE"), nullable=False)
 
     set = Relationship("FlashcardSet", back_populates="flashcards")
 
@@ -1,58 +1,182 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import ApiError, AsyncElasticsearch, Elasticsearch
+from app.core.circuit_breaker import CircuitBreaker
 from app.core.config import settings
 
 es_client = None
+async_es_client = None
+es_indices_ready = False
+
+def _is_es_failure(e: Exception) -> bool:
+    # 4xx answers mean ES is up and the request was wrong, they must not trip the breaker
+    if isinstance(e, ApiError):
+        return e.meta.status >= 500 or e.meta.status == 429
+    return True
+
+es_breaker = CircuitBreaker(
+    "elasticsearch",
+    settings.ES_BREAKER_FAILURE_THRESHOLD,
+    settings.ES_BREAKER_RESET_SECONDS,
+    is_failure=_is_es_failure,
+)
 
 def get_es_client():
     if es_client is None:
         raise RuntimeError("Elasticsearch client is not initialized")
     return es_client
 
+def get_async_es_client():
+    if async_es_client is None:
+        raise RuntimeError("Async Elasticsearch client is not initialized")
+    return async_es_client
+
+def _client_options() -> dict:
+    return {
+        "hosts": [{"host": settings.ELASTICSEARCH_HOST, "port": settings.ELASTICSEARCH_PORT, "scheme": "http"}],
+        "basic_auth": (settings.ELASTICSEARCH_USERNAME, settings.ELASTICSEARCH_PASSWORD),
+        "connections_per_node": settings.ES_CONNECTIONS_PER_NODE,
+        "request_timeout": settings.ES_REQUEST_TIMEOUT_SECONDS,
+        "max_retries": settings.ES_MAX_RETRIES,
+        "retry_on_timeout": True,
+        "retry_on_status": (429, 502, 503, 504),
+    }
+
 def connect_to_es():
     global es_client
     print("Connecting to Elasticsearch ...")
-    es_client = Elasticsearch(
-        [{"host": settings.ELASTICSEARCH_HOST, "port": settings.ELASTICSEARCH_PORT, "scheme": "http"}],
-        basic_auth=(settings.ELASTICSEARCH_USERNAME, settings.ELASTICSEARCH_PASSWORD)
-    )
-    if not es_client.ping():
-        raise ConnectionError("Failed to connect to Elasticsearch")
-    
+    es_client = Elasticsearch(**_client_options())
+    ensure_es_indices()
+
+def ensure_es_indices():
+    global es_indices_ready
+    if es_indices_ready:
+        return
+    try:
+        if not es_client.ping():
+            raise ConnectionError("Failed to connect to Elasticsearch")
+        create_view_events_index()
+        create_tags_index()
+    except Exception as e:
+        # The app keeps serving in degraded mode, a scheduled job retries this setup
+        es_breaker.record_failure()
+        print(f"Elasticsearch is unavailable, running without it: {e}")
+        return
+    es_indices_ready = True
+    es_breaker.record_success()
     print("Succesfully connected to Elasticsearch")
-    create_view_events_index()
-    create_tags_index()
 
-def create_view_events_index():
-    index_name = "view_events"
-    mapping = {
-        "properties": {
-            "user_id":{"type": "integer"},
-            "set_id" :{"type": "integer"},
-            "timestamp": {"type": "date"}
-        }
+VIEW_EVENTS_LEGACY_INDEX = "view_events"
+VIEW_EVENTS_WRITE_ALIAS = "view_events_write"
+# The legacy index is still read until ILM-managed indices cover the whole retention window
+VIEW_EVENTS_READ_INDICES = "view_events,view_events-*"
+VIEW_EVENTS_POLICY = "view_events_policy"
+SET_VIEWS_DAILY_INDEX = "set_views_daily"
+
+VIEW_EVENTS_MAPPING = {
+    "properties": {
+        "user_id":{"type": "integer"},
+        "set_id" :{"type": "integer"},
+        "is_public": {"type": "boolean"},
+        "weight": {"type": "float"},
+        "timestamp": {"type": "date"}
     }
+}
 
-    #ignore 400 means it won't raise error if the index exists
-    get_es_client().indices.create(index=index_name, mappings=mapping, ignore=400)
-    print(f"Index {index_name} is running")
+SET_VIEWS_DAILY_MAPPING = {
+    "properties": {
+        "set_id": {"type": "integer"},
+        "is_public": {"type": "boolean"},
+        "weight": {"type": "float"},
+        "timestamp": {"type": "date"}
+    }
+}
 
-def create_tags_index():
-    index_name = "flashcard_sets_tags"
-    mapping = {
-        "properties": {
-            "set_id":{"type": "integer"},
-            "name" :{"type": "text"},
-            "description": {"type": "text"},
-            "tags": {"type": "keyword"},
-            "is_public": {"type": "boolean"},
-            "creator_email": {"type": "text"},
-            "created_at": {"type": "date"}
+def create_view_events_index():
+    es = get_es_client()
+    es.ilm.put_lifecycle(name=VIEW_EVENTS_POLICY, policy={
+        "phases": {
+            "hot": {
+                "actions": {
+                    "rollover": {
+                        "max_age": f"{settings.VIEW_EVENTS_ROLLOVER_DAYS}d",
+                        "max_primary_shard_size": "10gb",
+                    }
+                }
+            },
+            "delete": {
+                "min_age": f"{settings.VIEW_EVENTS_RETENTION_DAYS}d",
+                "actions": {"delete": {}},
+            },
         }
+    })
+    es.indices.put_index_template(
+        name="view_events_template",
+        index_patterns=["view_events-*"],
+        template={
+            "settings": {
+                "index.lifecycle.name": VIEW_EVENTS_POLICY,
+                "index.lifecycle.rollover_alias": VIEW_EVENTS_WRITE_ALIAS,
+            },
+            "mappings": VIEW_EVENTS_MAPPING,
+        },
+    )
+
+    if not es.indices.exists_alias(name=VIEW_EVENTS_WRITE_ALIAS):
+        #ignore 400 means it won't raise error if another worker created it first
+        es.indices.create(
+            index="view_events-000001",
+            aliases={VIEW_EVENTS_WRITE_ALIAS: {"is_write_index": True}},
+            ignore=400,
+        )
+    if es.indices.exists(index=VIEW_EVENTS_LEGACY_INDEX):
+        es.indices.put_mapping(index=VIEW_EVENTS_LEGACY_INDEX, properties=VIEW_EVENTS_MAPPING["properties"])
+
+    es.indices.create(index=SET_VIEWS_DAILY_INDEX, mappings=SET_VIEWS_DAILY_MAPPING, ignore=400)
+    print(f"Index {VIEW_EVENTS_WRITE_ALIAS} is running")
+
+TAGS_INDEX_ALIAS = "flashcard_sets_tags"
+# Points at the index a reindex is building, so the outbox worker writes to it as well
+TAGS_BUILD_ALIAS = f"{TAGS_INDEX_ALIAS}_building"
+TAGS_INDEX_MAPPING = {
+    "properties": {
+        "set_id":{"type": "integer"},
+        "name" :{"type": "text"},
+        "description": {"type": "text"},
+        "tags": {"type": "keyword"},
+        "is_public": {"type": "boolean"},
+        "creator_email": {"type": "text"},
+        "created_at": {"type": "date"},
+        "suggest": {
+            "type": "completion",
+            "contexts": [{"name": "visibility", "type": "category"}],
+        },
     }
+}
+
+def create_tags_index():
+    es = get_es_client()
+    # Reads and writes go through the alias so the reindex script can swap the backing index
+    if es.indices.exists(index=TAGS_INDEX_ALIAS):
+        es.indices.put_mapping(index=TAGS_INDEX_ALIAS, properties=TAGS_INDEX_MAPPING["properties"])
+    else:
+        es.indices.create(
+            index=f"{TAGS_INDEX_ALIAS}_v1",
+            mappings=TAGS_INDEX_MAPPING,
+            aliases={TAGS_INDEX_ALIAS: {}},
+            ignore=400,
+        )
+    print(f"Index {TAGS_INDEX_ALIAS} is running")
+
+async def connect_to_async_es():
+    global async_es_client
+    # Used by async routes; the sync client stays for scripts, workers and threaded jobs
+    async_es_client = AsyncElasticsearch(**_client_options())
+    print("Async Elasticsearch client is ready")
 
-    #ignore 400 means it won't raise error if the index exists
-    get_es_client().indices.create(index=index_name, mappings=mapping, ignore=400)
-    print(f"Index {index_name} is running")
+async def close_async_es_connection():
+    global async_es_client
+    if async_es_client:
+        await async_es_client.close()
+        async_es_client = None
 
 def close_es_connection():
     global es_client
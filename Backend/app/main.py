@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, Response
@@ -9,9 +10,15 @@ from pydantic import BaseModel
 
 from app.api.routes import comments, materials, media, sets, shares, users, comments, auth
 from app.core.config import settings
+from app.core.response_cache import PublicResponseCacheMiddleware
+from app.core.scheduler import register_job, start_scheduled_jobs, stop_scheduled_jobs
 from app.core.telemetry import setup_telemetry
-from app.external.elastic import close_es_connection, connect_to_es
+from app.external.elastic import close_async_es_connection, close_es_connection, connect_to_async_es, connect_to_es, ensure_es_indices
 from app.external.minio import initialize_minio
+from app.services.leaderboard_service import refresh_leaderboards
+from app.services.trending_service import decay_trending_scores
+from app.services.view_event_pipeline import view_event_pipeline
+from app.services.view_rollup_service import rollup_view_events
 
 import enum
 
@@ -24,18 +31,44 @@ logging.basicConfig(
     handlers=[logging.StreamHandler(sys.stdout)]
 )
 
+register_job("elasticsearch_setup", settings.ES_SETUP_RETRY_SECONDS, ensure_es_indices)
+register_job("leaderboards", settings.LEADERBOARD_REFRESH_SECONDS, refresh_leaderboards)
+register_job("trending_decay", settings.TRENDING_DECAY_INTERVAL_SECONDS, decay_trending_scores)
+register_job("view_rollup", settings.VIEW_ROLLUP_INTERVAL_SECONDS, rollup_view_events)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Application startup")
     # setup_telemetry(app)
     initialize_minio()
     connect_to_es()
+    await connect_to_async_es()
+    view_event_pipeline.start()
+    start_scheduled_jobs()
     yield
     print("Application shutdown")
+    await stop_scheduled_jobs()
+    # Flushes whatever is still queued while the ES client is open
+    await asyncio.to_thread(view_event_pipeline.stop)
+    await close_async_es_connection()
     close_es_connection()
 
 app = FastAPI(title="Flashcard_backend", lifespan=lifespan)
 
+# Added before CORS so that CORS headers are computed per request, not replayed from the cache
+app.add_middleware(
+    PublicResponseCacheMiddleware,
+    route_ttls={
+        "/public/sets/most_viewed": 30,
+        "/public/sets/most_liked": 30,
+        "/public/sets/recently_created": 30,
+        "/public/sets/trending": 60,
+        "/public/search": 60,
+        "/public/search/suggest": 300,
+    },
+    max_bytes=settings.PUBLIC_RESPONSE_CACHE_MAX_BYTES,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"], 
@@ -45,14 +45,15 @@ def get_comments_for_set(
         ORDER BY c.path;
     """)
     comment_results = db.execute(query, {"set_id": set_id, "user_id": user_id})
+    return build_comments_data([dict(row._mapping) for row in comment_results])
 
+def build_comments_data(comment_rows: list[dict]) -> CommentsDataOut:
     comments = {}
     top_level_comment_ids = []
 
-    for row in comment_results:
-        comment_dict = dict(row._mapping)
+    for comment_dict in comment_rows:
         comment_dict['parent_id'] = comment_dict.pop('parent_comment_id')
-        comments[row.id] = CommentOut(**comment_dict, replies=[])
+        comments[comment_dict['id']] = CommentOut(**comment_dict, replies=[])
 
     for comment_id, comment in comments.items():
         if comment.parent_id:
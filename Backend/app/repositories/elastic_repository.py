@@ -1,59 +1,121 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-from app.external.elastic import get_es_client
+from elasticsearch import NotFoundError, helpers
 
-def log_view_event(
+from app.core.config import settings
+from app.external.elastic import SET_VIEWS_DAILY_INDEX, TAGS_BUILD_ALIAS, TAGS_INDEX_ALIAS, VIEW_EVENTS_READ_INDICES, VIEW_EVENTS_WRITE_ALIAS, es_breaker, get_async_es_client, get_es_client
+
+MOST_VIEWED_SIZE = 20
+SEARCH_TOTAL_HITS_CAP = 1000
+
+@es_breaker.protect
+def bulk_index_view_events(events: list[dict]) -> int:
+    es_client = get_es_client().options(request_timeout=settings.ES_BULK_TIMEOUT_SECONDS)
+    indexed, errors = helpers.bulk(
+        es_client,
+        ({"_index": VIEW_EVENTS_WRITE_ALIAS, "_source": event} for event in events),
+        raise_on_error=False,
+    )
+    if errors:
+        print(f"Failed to index {len(errors)} view events to ES")
+    return indexed
+
+@es_breaker.protect
+def update_view_events_visibility(
     set_id: int,
-    user_id: int,
+    is_public: bool,
 ):
-    try:
-        es_client = get_es_client()
-        es_client.index(
-            index="view_events",
-            document={
-                "user_id": user_id,
-                "set_id": set_id,
-                "timestamp": datetime.now(timezone.utc)
-            },
-        )
-    except Exception as e:
-        print(f"Error logging event view_events to ES: {e}")
+    es_client = get_es_client()
+    es_client.update_by_query(
+        index=f"{VIEW_EVENTS_READ_INDICES},{SET_VIEWS_DAILY_INDEX}",
+        ignore_unavailable=True,
+        query={"term": {"set_id": set_id}},
+        script={
+            "source": "ctx._source.is_public = params.is_public",
+            "params": {"is_public": is_public},
+        },
+        conflicts="proceed",
+        wait_for_completion=False,
+    )
 
-def index_set_tags(
-    set_id: int, 
-    document: dict
-):
+@es_breaker.protect
+def get_stored_tags(set_ids: list[int]) -> dict[int, list[str]]:
+    if not set_ids:
+        return {}
+    es_client = get_es_client()
+    response = es_client.mget(index="flashcard_sets_tags", ids=set_ids, source=["tags"])
+    return {
+        int(doc["_id"]): doc["_source"].get("tags") or []
+        for doc in response["docs"] if doc.get("found")
+    }
+
+@es_breaker.protect
+def bulk_sync_sets(actions: list[dict]) -> list[dict]:
+    es_client = get_es_client().options(request_timeout=settings.ES_BULK_TIMEOUT_SECONDS)
+    # Looked up after the sets were read from Postgres: a build started later scans newer data anyway
+    for build_index in _get_build_indices(es_client):
+        actions = actions + [{**action, "_index": build_index} for action in actions if "_index" not in action]
+    # 404 is a delete of a never-indexed set, 409 means a newer outbox entry already won
+    _, errors = helpers.bulk(
+        es_client,
+        actions,
+        index=TAGS_INDEX_ALIAS,
+        raise_on_error=False,
+        ignore_status=(404, 409),
+    )
+    return errors
+
+def _get_build_indices(es_client) -> list[str]:
+    # Concrete names, so a write racing the end of a build never auto-creates an index named after the alias
     try:
-        es_client = get_es_client()
-        es_client.index(
-            index="flashcard_sets_tags",
-            id=set_id,
-            document=document,
-        )
-    except Exception as e:
-        print(f"Error indexing set tags to ES: {e}")
+        return list(es_client.indices.get_alias(name=TAGS_BUILD_ALIAS))
+    except NotFoundError:
+        return []
 
+@es_breaker.protect
 def get_most_viewed(
-    cutoff_date: datetime, now: datetime, public_sets_ids: list[int]
+    cutoff_date: datetime, now: datetime, rollup_boundary: datetime | None = None
 ) -> dict:
-    query = {
-        "size": 0,
-        "query": {
+    indices = VIEW_EVENTS_READ_INDICES
+    time_filter = {"range": {"timestamp": {"gte": cutoff_date.isoformat(), "lte": now.isoformat()}}}
+    if rollup_boundary and rollup_boundary > cutoff_date:
+        # Whole days before the boundary come from the rollup, only the rest from raw events.
+        # Rollups are stamped at midnight UTC, so the window's first day is counted whole.
+        rollup_start = cutoff_date.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        indices = f"{VIEW_EVENTS_READ_INDICES},{SET_VIEWS_DAILY_INDEX}"
+        time_filter = {
             "bool": {
-                "must": [
+                "should": [
                     {
-                        "range": {
-                            "timestamp": {
-                                "gte": cutoff_date.isoformat(),
-                                "lte": now.isoformat(),
-                            }
+                        "bool": {
+                            "filter": [
+                                {"term": {"_index": SET_VIEWS_DAILY_INDEX}},
+                                {"range": {"timestamp": {"gte": rollup_start.isoformat(), "lt": rollup_boundary.isoformat()}}},
+                            ]
                         }
-                    }
+                    },
+                    {
+                        "bool": {
+                            "must_not": [{"term": {"_index": SET_VIEWS_DAILY_INDEX}}],
+                            "filter": [
+                                {"range": {"timestamp": {"gte": rollup_boundary.isoformat(), "lte": now.isoformat()}}},
+                            ],
+                        }
+                    },
                 ],
+                "minimum_should_match": 1,
+            }
+        }
+
+    query = {
+        "size": 0,
+        "query": {
+            "bool": {
+                "must": [time_filter],
                 "filter": [
                     {
-                        "terms":{
-                            "set_id": public_sets_ids
+                        "term": {
+                            "is_public": True
                         }
                     }
                 ]
@@ -64,45 +126,147 @@ def get_most_viewed(
             "top_sets": {
                 "terms": {
                     "field": "set_id",
-                    "size": 20,
-                    "order": {"_count": "desc"}
+                    # Over-fetch so sets deleted or made private since the last visibility sync can be dropped
+                    "size": MOST_VIEWED_SIZE * 2,
+                    "order": {"views": "desc"}
+                },
+                "aggs": {
+                    # Sampled anonymous views carry 1 / sample rate, older events have no weight
+                    "views": {"sum": {"field": "weight", "missing": 1}}
                 }
             }
         }
     }
     try:
         es_client = get_es_client()
-        return es_client.search(index="view_events", body=query)
+        return es_client.search(index=indices, body=query, ignore_unavailable=True)
     except Exception as e:
         print(f"Error getting most viewed sets from ES: {e}")
         raise
 
-def get_last_viewed_for_user(
-    user_id: int
+@es_breaker.protect
+def get_rollup_boundary() -> datetime | None:
+    es_client = get_es_client()
+    response = es_client.search(
+        index=SET_VIEWS_DAILY_INDEX,
+        size=0,
+        aggs={"last_day": {"max": {"field": "timestamp"}}},
+        ignore_unavailable=True,
+    )
+    last_day = response.get("aggregations", {}).get("last_day", {}).get("value")
+    if last_day is None:
+        return None
+    return datetime.fromtimestamp(last_day / 1000, tz=timezone.utc) + timedelta(days=1)
+
+@es_breaker.protect
+def get_first_view_event_time() -> datetime | None:
+    es_client = get_es_client()
+    response = es_client.search(
+        index=VIEW_EVENTS_READ_INDICES,
+        size=0,
+        aggs={"first_event": {"min": {"field": "timestamp"}}},
+        ignore_unavailable=True,
+    )
+    first_event = response.get("aggregations", {}).get("first_event", {}).get("value")
+    if first_event is None:
+        return None
+    return datetime.fromtimestamp(first_event / 1000, tz=timezone.utc)
+
+@es_breaker.protect
+def aggregate_daily_views(day_start: datetime) -> list[dict]:
+    es_client = get_es_client()
+    day_end = day_start + timedelta(days=1)
+    documents = []
+    after_key = None
+    while True:
+        composite = {
+            "size": 1000,
+            "sources": [{"set_id": {"terms": {"field": "set_id"}}}],
+        }
+        if after_key:
+            composite["after"] = after_key
+        response = es_client.search(
+            index=VIEW_EVENTS_READ_INDICES,
+            size=0,
+            query={"range": {"timestamp": {"gte": day_start.isoformat(), "lt": day_end.isoformat()}}},
+            aggs={
+                "sets": {
+                    "composite": composite,
+                    "aggs": {
+                        "views": {"sum": {"field": "weight", "missing": 1}},
+                        "is_public": {"max": {"field": "is_public"}},
+                    },
+                }
+            },
+            ignore_unavailable=True,
+        )
+        sets = response["aggregations"]["sets"]
+        for bucket in sets["buckets"]:
+            documents.append({
+                "set_id": bucket["key"]["set_id"],
+                "is_public": bucket["is_public"]["value"] == 1,
+                "weight": bucket["views"]["value"],
+                "timestamp": day_start,
+            })
+        after_key = sets.get("after_key")
+        if not sets["buckets"] or not after_key:
+            return documents
+
+@es_breaker.protect
+def bulk_index_daily_views(documents: list[dict]):
+    es_client = get_es_client()
+    # Deterministic ids make re-running a day overwrite instead of double count
+    helpers.bulk(
+        es_client,
+        (
+            {
+                "_index": SET_VIEWS_DAILY_INDEX,
+                "_id": f"{document['set_id']}-{document['timestamp']:%Y-%m-%d}",
+                "_source": document,
+            } for document in documents
+        ),
+        refresh="wait_for",
+    )
+
+@es_breaker.protect
+async def search_public_sets(
+    text_query: str
 ) -> dict:
     query = {
-        "size": 100,
-        "sort": [{"timestamp": "desc"}],
+        "size": 20,
         "query": {
             "bool": {
-                "must": [
-                    {"match": {"user_id": user_id}}
-                ]
+                "must": {
+                    "multi_match": {
+                        "query": text_query,
+                        "fields": ["name^3", "tags^2", "description"],
+                        "fuzziness": "AUTO",
+                        "tie_breaker": 0.3,
+                    }
+                },
+                "filter": {
+                    "term": {"is_public": True}
+                }
             }
         }
     }
+
     try:
-        es_client = get_es_client()
-        return es_client.search(index="view_events", body=query)
+        es_client = get_async_es_client().options(request_timeout=settings.ES_SEARCH_TIMEOUT_SECONDS)
+        return await es_client.search(index="flashcard_sets_tags", body=query)
     except Exception as e:
-        print(f"Error getting last viewed sets from ES: {e}")
+        print(f"Error searching publics sets in ES: {e}")
         raise
 
-def search_public_sets(
-    text_query: str
+@es_breaker.protect
+async def search_public_sets_page(
+    text_query: str,
+    size: int,
+    search_after: list | None = None,
 ) -> dict:
     query = {
-        "size": 20,
+        "size": size,
+        "track_total_hits": SEARCH_TOTAL_HITS_CAP,
         "query": {
             "bool": {
                 "must": {
@@ -117,12 +281,77 @@ def search_public_sets(
                     "term": {"is_public": True}
                 }
             }
-        }
+        },
+        "sort": [
+            {"_score": "desc"},
+            {"set_id": "asc"},
+        ],
+        "highlight": {
+            "pre_tags": ["<strong>"],
+            "post_tags": ["</strong>"],
+            "fields": {
+                "name": {"number_of_fragments": 0},
+                "description": {"fragment_size": 150, "number_of_fragments": 2},
+                "tags": {},
+            },
+        },
     }
+    if search_after:
+        query["search_after"] = search_after
 
     try:
-        es_client = get_es_client()
-        return es_client.search(index="flashcard_sets_tags", body=query)
+        es_client = get_async_es_client().options(request_timeout=settings.ES_SEARCH_TIMEOUT_SECONDS)
+        return await es_client.search(index="flashcard_sets_tags", body=query)
     except Exception as e:
-        print(f"Error searching publics sets in ES: {e}")
-        raise
\ No newline at end of file
+        print(f"Error searching publics sets page in ES: {e}")
+        raise
+
+def build_set_document(
+    set_id: int,
+    name: str,
+    description: str,
+    tags: list[str],
+    is_public: bool,
+    creator_email: str,
+    created_at: datetime,
+) -> dict:
+    return {
+        "set_id": set_id,
+        "name": name,
+        "description": description,
+        "tags": tags,
+        "is_public": is_public,
+        "creator_email": creator_email,
+        "created_at": created_at,
+        "suggest": {
+            "input": [name, *tags],
+            "contexts": {"visibility": ["public" if is_public else "private"]},
+        },
+    }
+
+@es_breaker.protect
+async def suggest_public_sets(
+    prefix: str,
+    size: int,
+) -> dict:
+    query = {
+        "_source": False,
+        "suggest": {
+            "set_suggest": {
+                "prefix": prefix,
+                "completion": {
+                    "field": "suggest",
+                    "size": size,
+                    "skip_duplicates": True,
+                    "contexts": {"visibility": ["public"]},
+                },
+            }
+        },
+    }
+
+    try:
+        es_client = get_async_es_client().options(request_timeout=settings.ES_SUGGEST_TIMEOUT_SECONDS)
+        return await es_client.search(index="flashcard_sets_tags", body=query)
+    except Exception as e:
+        print(f"Error getting search suggestions from ES: {e}")
+        raise
@@ -1,6 +1,6 @@
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, text
 
 from app.api.schemas import FlashcardSetUpdate, FlashcardSetUpdateAndCreate
 from app.db.models import Flashcard, FlashcardSet, Material, User, Vote, VoteTypeEnum
@@ -8,6 +8,146 @@ from app.db.models import Flashcard, FlashcardSet, Material, User, Vote, VoteTyp
 def get_set_by_id(db: Session, set_id: int) -> FlashcardSet | None:
     return db.query(FlashcardSet).filter(FlashcardSet.id == set_id).first()
 
+def get_flashcards_page(db: Session, set_id: int, after_id: int | None, limit: int) -> list[Flashcard]:
+    query = db.query(Flashcard).filter(Flashcard.set_id == set_id)
+    if after_id is not None:
+        query = query.filter(Flashcard.id > after_id)
+    return query.order_by(Flashcard.id).limit(limit).all()
+
+_REQUESTED_SET_JOINS = """
+    FROM materials requested
+    LEFT JOIN flashcard_sets requested_set ON requested_set.id = requested.id
+    LEFT JOIN material_shares viewer_share
+        ON viewer_share.material_id = requested.id AND viewer_share.user_id = :user_id
+    LEFT JOIN materials m
+        ON m.id = CASE WHEN requested.item_type = 'link' THEN requested.linked_material_id ELSE requested.id END
+    LEFT JOIN flashcard_sets fs ON fs.id = m.id
+"""
+
+def bump_version(db: Session, set_id: int):
+    db.query(FlashcardSet).filter(
+        FlashcardSet.id == set_id
+    ).update({FlashcardSet.version: FlashcardSet.version + 1}, synchronize_session=False)
+
+def get_set_details(
+    db: Session,
+    material_id: int,
+    user_id: int | None,
+    card_limit: int,
+    cached_set_id: int | None,
+    cached_version: int | None,
+):
+    # The viewer-independent parts are only built when the caller's cached copy is stale,
+    # so a cache hit and a miss both cost one round trip
+    query = text(f"""
+        SELECT
+            requested.owner_id AS requested_owner_id,
+            COALESCE(requested_set.is_public, FALSE) AS requested_is_public,
+            viewer_share.permission AS viewer_permission,
+            viewer_share.status AS viewer_share_status,
+            m.id,
+            m.name,
+            m.owner_id,
+            fs.id IS NOT NULL AS has_set,
+            fs.description,
+            fs.is_public,
+            fs.version,
+            creator.email AS creator,
+            card_count.flashcard_count,
+            cards.flashcards,
+            shares.shared_with,
+            votes.upvotes,
+            votes.downvotes,
+            comments.comments,
+            (
+                SELECT vote_type FROM votes
+                WHERE votable_id = m.id AND votable_type = 'material' AND user_id = :user_id
+            ) AS user_vote,
+            (
+                SELECT json_object_agg(comment.id, vote.vote_type)
+                FROM votes vote
+                JOIN comments comment ON comment.id = vote.votable_id
+                WHERE vote.votable_type = 'comment' AND vote.user_id = :user_id AND comment.material_id = m.id
+            ) AS comment_votes
+        {_REQUESTED_SET_JOINS}
+        CROSS JOIN LATERAL (
+            SELECT (fs.id, fs.version) IS DISTINCT FROM (:cached_set_id, :cached_version) AS load_details
+        ) gate
+        LEFT JOIN users creator ON creator.id = m.owner_id
+        LEFT JOIN LATERAL (
+            SELECT COUNT(*) AS flashcard_count
+            FROM flashcards
+            WHERE set_id = fs.id AND gate.load_details
+        ) card_count ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT COALESCE(json_agg(json_build_object(
+                'id', page.id,
+                'front_content', page.front_content,
+                'back_content', page.back_content
+            ) ORDER BY page.id), '[]'::json) AS flashcards
+            FROM (
+                SELECT id, front_content, back_content
+                FROM flashcards
+                WHERE set_id = fs.id AND gate.load_details
+                ORDER BY id
+                LIMIT :card_limit
+            ) page
+        ) cards ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT COALESCE(json_agg(json_build_object(
+                'user_id', shared_user.id,
+                'email', shared_user.email,
+                'permission', ms.permission
+            ) ORDER BY ms.id), '[]'::json) AS shared_with
+            FROM material_shares ms
+            JOIN users shared_user ON shared_user.id = ms.user_id
+            WHERE ms.material_id = m.id AND gate.load_details
+        ) shares ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT
+                COUNT(*) FILTER (WHERE vote_type = 'upvote') AS upvotes,
+                COUNT(*) FILTER (WHERE vote_type = 'downvote') AS downvotes
+            FROM votes
+            WHERE votable_id = m.id AND votable_type = 'material' AND gate.load_details
+        ) votes ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT COALESCE(json_agg(json_build_object(
+                'id', c.id,
+                'text', c.text,
+                'created_at', c.created_at,
+                'parent_comment_id', c.parent_comment_id,
+                'author_email', c.author_email,
+                'upvotes', c.upvotes,
+                'downvotes', c.downvotes,
+                'user_vote', NULL
+            ) ORDER BY c.path), '[]'::json) AS comments
+            FROM (
+                SELECT
+                    c.id,
+                    c.text,
+                    c.created_at,
+                    c.parent_comment_id,
+                    c.path,
+                    u.email AS author_email,
+                    COUNT(v.id) FILTER (WHERE v.vote_type = 'upvote') AS upvotes,
+                    COUNT(v.id) FILTER (WHERE v.vote_type = 'downvote') AS downvotes
+                FROM comments c
+                JOIN users u ON c.user_id = u.id
+                LEFT JOIN votes v ON v.votable_id = c.id AND v.votable_type = 'comment'
+                WHERE c.material_id = m.id AND gate.load_details
+                GROUP BY c.id, u.email
+            ) c
+        ) comments ON TRUE
+        WHERE requested.id = :material_id
+    """)
+    return db.execute(query, {
+        "material_id": material_id,
+        "user_id": user_id,
+        "card_limit": card_limit,
+        "cached_set_id": cached_set_id,
+        "cached_version": cached_version,
+    }).mappings().first()
+
 def create_flashcard_set(db: Session, set_id: int, data: FlashcardSetUpdateAndCreate) -> FlashcardSet:
     new_set = FlashcardSet(
         id=set_id,
@@ -30,6 +170,7 @@ def create_flashcard_set(db: Session, set_id: int, data: FlashcardSetUpdateAndCr
 def update_flashcard_set(db: Session, flashcard_set: FlashcardSet, data: FlashcardSetUpdate) -> FlashcardSet:
     flashcard_set.description = data.description
     flashcard_set.is_public = data.is_public
+    flashcard_set.version = FlashcardSet.version + 1
     
     existing_cards = {card.id: card for card in flashcard_set.flashcards}
     incoming_cards = {card.id for card in data.flashcards if card.id is not None}
@@ -54,9 +195,26 @@ def update_flashcard_set(db: Session, flashcard_set: FlashcardSet, data: Flashca
     db.commit()
     return flashcard_set
 
-def get_public_set_ids(db: Session) -> list[int]:
-    query_result = db.query(FlashcardSet.id).filter(FlashcardSet.is_public == True).all()
-    return [id for (id, ) in query_result]
+def copy_flashcard_set(db: Session, source_set_id: int, new_set_id: int) -> int | None:
+    set_result = db.execute(text("""
+        INSERT INTO flashcard_sets (id, description, is_public)
+        SELECT :new_set_id, description, FALSE
+        FROM flashcard_sets
+        WHERE id = :source_set_id
+    """), {"source_set_id": source_set_id, "new_set_id": new_set_id})
+
+    if set_result.rowcount == 0:
+        return None
+
+    cards_result = db.execute(text("""
+        INSERT INTO flashcards (front_content, back_content, set_id)
+        SELECT front_content, back_content, :new_set_id
+        FROM flashcards
+        WHERE set_id = :source_set_id
+        ORDER BY id
+    """), {"source_set_id": source_set_id, "new_set_id": new_set_id})
+
+    return cards_result.rowcount
 
 def get_most_liked_sets(db: Session, cutoff_date: datetime) -> list[tuple[int, int]]:
     like_count = func.count(Vote.id).label("like_count")
@@ -99,3 +257,34 @@ def get_recently_created_sets(db: Session) -> list[tuple[int, str, str, datetime
     ).order_by(
         Material.created_at.desc()
     ).limit(20).all()
+
+
+def _sets_for_indexing_query(db: Session):
+    return db.query(
+        Material.id,
+        Material.name,
+        FlashcardSet.description,
+        FlashcardSet.is_public,
+        Material.created_at,
+        User.email,
+    ).join(
+        User, Material.owner_id == User.id
+    ).join(
+        FlashcardSet, Material.id == FlashcardSet.id
+    ).filter(
+        Material.item_type == "set"
+    )
+
+def stream_sets_for_indexing(db: Session, batch_size: int):
+    return _sets_for_indexing_query(db).execution_options(
+        stream_results=True, yield_per=batch_size
+    )
+
+def get_sets_for_indexing(db: Session, set_ids: list[int]) -> list[tuple[int, str, str, bool, datetime, str]]:
+    return _sets_for_indexing_query(db).filter(Material.id.in_(set_ids)).all()
+
+def get_existing_set_ids(db: Session, set_ids: list[int]) -> set[int]:
+    return {set_id for (set_id, ) in db.query(FlashcardSet.id).filter(FlashcardSet.id.in_(set_ids))}
+
+def count_sets(db: Session) -> int:
+    return db.query(FlashcardSet).count()
@@ -1,13 +1,39 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import and_, text
 from sqlalchemy.orm import Session, joinedload
 
 from app.api.schemas import MaterialUpdate
-from app.db.models import FlashcardSet, Material, User
+from app.db.models import FlashcardSet, Material, MaterialShare, PermissionEnum, ShareStatusEnum, User
 
 def get_all_materials_for_user(db: Session, user_id: int) -> list[Material]:
     return db.query(Material).filter(Material.owner_id == user_id).all()
 
+def get_change_horizon(db: Session) -> int:
+    # Every transaction with a lower id has finished, so nothing below it can still appear
+    return db.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")).scalar_one()
+
+def get_material_changes(db: Session, user_id: int, since: int | None, until: int) -> list:
+    return db.execute(text("""
+        SELECT id, name, item_type, parent_id, linked_material_id, FALSE AS deleted
+        FROM materials
+        WHERE owner_id = :user_id
+            AND change_xid >= CAST(CAST(:since AS text) AS xid8)
+            AND change_xid < CAST(CAST(:until AS text) AS xid8)
+        UNION ALL
+        SELECT material_id, NULL, NULL, NULL, NULL, TRUE
+        FROM material_tombstones
+        WHERE owner_id = :user_id
+            AND change_xid >= CAST(CAST(:since AS text) AS xid8)
+            AND change_xid < CAST(CAST(:until AS text) AS xid8)
+            AND :include_deleted
+    """), {
+        "user_id": user_id,
+        "since": since or 0,
+        "until": until,
+        "include_deleted": since is not None,
+    }).mappings().all()
+
 def get_all_materials_by_id(db: Session, material_id: int) -> Material:
     return db.query(Material).filter(Material.id == material_id).first()
 
@@ -16,20 +42,26 @@ def get_material_with_flashcards(db: Session, material_id: int) -> Material | No
         joinedload(Material.flashcard_set).joinedload(FlashcardSet.flashcards)
     ).filter(Material.id == material_id).first()
 
-def get_material_with_public_status(db: Session, material_id: int) -> tuple[Material, bool] | None:
-    result = db.query(
+def get_materials_with_access(
+    db: Session,
+    material_ids: list[int],
+    user_id: int | None,
+) -> list[tuple[Material, bool | None, PermissionEnum | None, ShareStatusEnum | None]]:
+    return db.query(
         Material,
-        FlashcardSet.is_public
+        FlashcardSet.is_public,
+        MaterialShare.permission,
+        MaterialShare.status,
     ).outerjoin(
-            FlashcardSet,
-            Material.id == FlashcardSet.id
-    ).filter(Material.id == material_id).first()
-
-    if not result:
-        return None
-    
-    material, is_public = result
-    return material, (is_public or False)
+        FlashcardSet, Material.id == FlashcardSet.id
+    ).outerjoin(
+        MaterialShare, and_(
+            MaterialShare.material_id == Material.id,
+            MaterialShare.user_id == user_id,
+        )
+    ).filter(
+        Material.id.in_(material_ids)
+    ).all()
 
 def create_new_material(
     db: Session,
@@ -37,7 +69,8 @@ def create_new_material(
     item_type: str, 
     owner_id: int, 
     parent_id: Optional[int] = None,
-    linked_material_id: Optional[int] = None
+    linked_material_id: Optional[int] = None,
+    commit: bool = True,
 ) -> Material:
     new_material = Material(
         name=name,
@@ -48,6 +81,10 @@ def create_new_material(
     )
 
     db.add(new_material)
+    if not commit:
+        db.flush()
+        return new_material
+
     db.commit()
     db.refresh(new_material)
     return new_material
@@ -56,15 +93,24 @@ def update_material(
     db: Session,
     material: Material,
     update_data: MaterialUpdate, 
+    commit: bool = True,
 ) -> Material:
     update_dict = update_data.model_dump(exclude_unset=True)
 
     if "name" in update_dict:
         material.name = update_data.name
+        if material.item_type == "set":
+            db.query(FlashcardSet).filter(
+                FlashcardSet.id == material.id
+            ).update({FlashcardSet.version: FlashcardSet.version + 1}, synchronize_session=False)
 
     if "parent_id" in update_dict:
         material.parent_id = update_data.parent_id
 
+    if not commit:
+        db.flush()
+        return material
+
     db.commit()
     db.refresh(material)
     return material
@@ -72,23 +118,121 @@ def update_material(
 def delete_material(
     db: Session,
     material: Material,
+    commit: bool = True,
 ) -> Material:
     db.delete(material)
-    db.commit()
-
-def get_all_material_child_ids(db: Session, item_id: int) -> list[int]:
-    ids_to_delete = set()
-    queue = [item_id]
-
-    while queue:
-        current_id = queue.pop(0)
-        ids_to_delete.add(current_id)
-
-        children = db.query(Material).filter(Material.parent_id == current_id).all()
-        for child in children:
-            queue.append(child.id)
-
-    return list(ids_to_delete)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+
+def delete_material_subtree(db: Session, item_id: int, commit: bool = True) -> list[int]:
+    deleted_ids = db.execute(text("""
+        DELETE FROM materials
+        WHERE path <@ (SELECT path FROM materials WHERE id = :item_id)
+        RETURNING id
+    """), {"item_id": item_id}).scalars().all()
+    if commit:
+        db.commit()
+    return deleted_ids
+
+def find_moves_into_own_subtree(db: Session, moves: list[tuple[int, int]]) -> set[int]:
+    if not moves:
+        return set()
+
+    item_ids, parent_ids = zip(*moves)
+    return set(db.execute(text("""
+        SELECT moved.id
+        FROM unnest(CAST(:item_ids AS INT[]), CAST(:parent_ids AS INT[])) AS move(item_id, parent_id)
+        JOIN materials moved ON moved.id = move.item_id
+        JOIN materials target ON target.id = move.parent_id
+        WHERE target.path <@ moved.path
+    """), {"item_ids": list(item_ids), "parent_ids": list(parent_ids)}).scalars().all())
+
+def is_in_subtree(db: Session, root_id: int, material_id: int) -> bool:
+    return db.execute(text("""
+        SELECT EXISTS (
+            SELECT 1
+            FROM materials m
+            JOIN materials root ON m.path <@ root.path
+            WHERE root.id = :root_id AND m.id = :material_id
+        )
+    """), {"root_id": root_id, "material_id": material_id}).scalar()
+
+def get_subtree_nodes(db: Session, root_id: int) -> list[tuple[int, int | None]]:
+    return db.execute(text("""
+        SELECT m.id, m.parent_id
+        FROM materials m
+        JOIN materials root ON m.path <@ root.path
+        WHERE root.id = :root_id AND m.item_type <> 'link'
+        ORDER BY nlevel(m.path)
+    """), {"root_id": root_id}).all()
+
+def copy_material_subtree(
+    db: Session,
+    root_id: int,
+    material_ids: list[int],
+    owner_id: int,
+    target_parent_id: Optional[int],
+    root_name: str,
+) -> dict[str, int]:
+    db.execute(text("""
+        CREATE TEMP TABLE material_copy_map ON COMMIT DROP AS
+        SELECT
+            m.id AS old_id,
+            nlevel(m.path) AS depth,
+            nextval(pg_get_serial_sequence('materials', 'id')) AS new_id
+        FROM materials m
+        WHERE m.id = ANY(:material_ids)
+    """), {"material_ids": material_ids})
+
+    materials_result = db.execute(text("""
+        INSERT INTO materials (id, name, item_type, owner_id, parent_id)
+        SELECT
+            map.new_id,
+            CASE WHEN m.id = :root_id THEN :root_name ELSE m.name END,
+            m.item_type,
+            :owner_id,
+            CASE WHEN m.id = :root_id THEN :target_parent_id ELSE parent_map.new_id END
+        FROM material_copy_map map
+        JOIN materials m ON m.id = map.old_id
+        LEFT JOIN material_copy_map parent_map ON parent_map.old_id = m.parent_id
+        ORDER BY map.depth
+        RETURNING item_type
+    """), {
+        "root_id": root_id,
+        "root_name": root_name,
+        "owner_id": owner_id,
+        "target_parent_id": target_parent_id,
+    })
+    item_types = [item_type for (item_type, ) in materials_result]
+
+    db.execute(text("""
+        INSERT INTO flashcard_sets (id, description, is_public)
+        SELECT map.new_id, fs.description, FALSE
+        FROM material_copy_map map
+        JOIN flashcard_sets fs ON fs.id = map.old_id
+    """))
+
+    cards_result = db.execute(text("""
+        INSERT INTO flashcards (front_content, back_content, set_id)
+        SELECT f.front_content, f.back_content, map.new_id
+        FROM material_copy_map map
+        JOIN flashcards f ON f.set_id = map.old_id
+        ORDER BY f.id
+    """))
+
+    root_copy_id = db.execute(
+        text("SELECT new_id FROM material_copy_map WHERE old_id = :root_id"),
+        {"root_id": root_id},
+    ).scalar_one()
+
+    return {
+        "root_id": root_copy_id,
+        "folders_copied": item_types.count("folder"),
+        "sets_copied": item_types.count("set"),
+        "flashcards_copied": cards_result.rowcount,
+    }
 
 def get_material_details_batch(
     db: Session,
@@ -106,5 +250,6 @@ def get_material_details_batch(
         FlashcardSet, Material.id == FlashcardSet.id
     ).filter(
         Material.id.in_(set_ids),
-        Material.item_type == "set"
+        Material.item_type == "set",
+        FlashcardSet.is_public == True
     ).all()
\ No newline at end of file
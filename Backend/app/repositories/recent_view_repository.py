@@ -0,0 +1,52 @@
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+def upsert_recent_views(db: Session, views: list[tuple[int, int, datetime]], keep_per_user: int):
+    if not views:
+        return
+    latest_views: dict[tuple[int, int], datetime] = {}
+    for user_id, set_id, viewed_at in views:
+        key = (user_id, set_id)
+        if key not in latest_views or viewed_at > latest_views[key]:
+            latest_views[key] = viewed_at
+    # One row per key, since ON CONFLICT cannot touch a row twice, and sorted so
+    # concurrent flushes lock rows in the same order
+    views = sorted((user_id, set_id, viewed_at) for (user_id, set_id), viewed_at in latest_views.items())
+    db.execute(text("""
+        INSERT INTO recently_viewed_sets (user_id, set_id, viewed_at)
+        SELECT v.user_id, v.set_id, v.viewed_at
+        FROM unnest(CAST(:user_ids AS int[]), CAST(:set_ids AS int[]), CAST(:viewed_ats AS timestamptz[]))
+            AS v(user_id, set_id, viewed_at)
+        JOIN flashcard_sets fs ON fs.id = v.set_id
+        JOIN users u ON u.id = v.user_id
+        ON CONFLICT (user_id, set_id) DO UPDATE
+        SET viewed_at = GREATEST(recently_viewed_sets.viewed_at, EXCLUDED.viewed_at)
+    """), {
+        "user_ids": [user_id for user_id, _, _ in views],
+        "set_ids": [set_id for _, set_id, _ in views],
+        "viewed_ats": [viewed_at for _, _, viewed_at in views],
+    })
+    db.execute(text("""
+        DELETE FROM recently_viewed_sets r
+        USING (
+            SELECT user_id, set_id,
+                row_number() OVER (PARTITION BY user_id ORDER BY viewed_at DESC) AS position
+            FROM recently_viewed_sets
+            WHERE user_id = ANY(:user_ids)
+        ) ranked
+        WHERE r.user_id = ranked.user_id
+            AND r.set_id = ranked.set_id
+            AND ranked.position > :keep
+    """), {"user_ids": list({user_id for user_id, _, _ in views}), "keep": keep_per_user})
+
+def get_recent_sets(db: Session, user_id: int, limit: int) -> list[tuple[int, str, str, datetime]]:
+    return db.execute(text("""
+        SELECT m.id, m.name, u.email, r.viewed_at
+        FROM recently_viewed_sets r
+        JOIN materials m ON m.id = r.set_id
+        JOIN users u ON u.id = m.owner_id
+        WHERE r.user_id = :user_id
+        ORDER BY r.viewed_at DESC
+        LIMIT :limit
+    """), {"user_id": user_id, "limit": limit}).all()
@@ -0,0 +1,50 @@
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+MAX_RETRY_DELAY_SECONDS = 300
+
+def enqueue(db: Session, set_id: int, regenerate_tags: bool = False):
+    db.execute(text(
+        "INSERT INTO search_outbox (set_id, regenerate_tags) VALUES (:set_id, :regenerate_tags)"
+    ), {"set_id": set_id, "regenerate_tags": regenerate_tags})
+
+def claim_batch(db: Session, limit: int, lease_seconds: int) -> list[dict]:
+    # Pushing available_at out leases the rows, so the caller can commit before doing slow work.
+    # Entries of a worker that dies come back once the lease runs out.
+    return db.execute(text("""
+        UPDATE search_outbox
+        SET available_at = now() + :lease_seconds * interval '1 second'
+        WHERE id IN (
+            SELECT id
+            FROM search_outbox
+            WHERE available_at <= now()
+            ORDER BY id
+            LIMIT :limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, set_id, regenerate_tags, sync_view_visibility, attempts, created_at
+    """), {"limit": limit, "lease_seconds": lease_seconds}).mappings().all()
+
+def delete_entries(db: Session, entry_ids: list[int]):
+    if not entry_ids:
+        return
+    db.execute(text(
+        "DELETE FROM search_outbox WHERE id = ANY(:ids)"
+    ), {"ids": entry_ids})
+
+def reschedule_entries(db: Session, entry_ids: list[int], error: str):
+    if not entry_ids:
+        return
+    db.execute(text("""
+        UPDATE search_outbox
+        SET attempts = attempts + 1,
+            last_error = :error,
+            available_at = now() + least(power(2, attempts), :max_delay) * interval '1 second'
+        WHERE id = ANY(:ids)
+    """), {"ids": entry_ids, "error": error, "max_delay": MAX_RETRY_DELAY_SECONDS})
+
+def get_backlog(db: Session) -> tuple[int, datetime | None]:
+    return db.execute(text(
+        "SELECT count(*), min(created_at) FROM search_outbox"
+    )).one()
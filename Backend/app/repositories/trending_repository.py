@@ -0,0 +1,59 @@
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Scores use forward decay: an event of weight w at time t is stored as
+# w * 2^((t - epoch) / half_life), so stored scores of all sets stay comparable
+# without touching every row. decay_scores() periodically rebases them to a new epoch.
+
+def add_score(db: Session, set_id: int, weight: float, half_life_seconds: float):
+    db.execute(text("""
+        INSERT INTO set_trending (set_id, score, updated_at)
+        SELECT
+            fs.id,
+            :weight * power(2, extract(epoch FROM now() - state.epoch) / :half_life),
+            now()
+        FROM trending_state state
+        JOIN flashcard_sets fs ON fs.id = :set_id
+        WHERE state.id = 1
+        FOR SHARE OF state
+        ON CONFLICT (set_id) DO UPDATE
+        SET score = set_trending.score + EXCLUDED.score, updated_at = EXCLUDED.updated_at
+    """), {"set_id": set_id, "weight": weight, "half_life": half_life_seconds})
+
+def decay_scores(db: Session, half_life_seconds: float, min_score: float):
+    epoch = db.execute(text(
+        "SELECT epoch FROM trending_state WHERE id = 1 FOR UPDATE"
+    )).scalar_one()
+
+    db.execute(text("""
+        UPDATE set_trending
+        SET score = score / power(2, extract(epoch FROM now() - :epoch) / :half_life)
+    """), {"epoch": epoch, "half_life": half_life_seconds})
+    db.execute(text(
+        "DELETE FROM set_trending WHERE abs(score) < :min_score"
+    ), {"min_score": min_score})
+    db.execute(text("UPDATE trending_state SET epoch = now() WHERE id = 1"))
+
+def get_trending_sets(
+    db: Session,
+    half_life_seconds: float,
+    limit: int,
+) -> list[tuple[int, str, str, str, datetime, float]]:
+    return db.execute(text("""
+        SELECT
+            m.id,
+            m.name,
+            fs.description,
+            u.email,
+            m.created_at,
+            t.score / power(2, extract(epoch FROM now() - state.epoch) / :half_life) AS trending_score
+        FROM set_trending t
+        JOIN flashcard_sets fs ON fs.id = t.set_id
+        JOIN materials m ON m.id = t.set_id
+        JOIN users u ON u.id = m.owner_id
+        CROSS JOIN trending_state state
+        WHERE fs.is_public AND state.id = 1 AND t.score > 0
+        ORDER BY t.score DESC
+        LIMIT :limit
+    """), {"half_life": half_life_seconds, "limit": limit}).all()
@@ -0,0 +1,137 @@
+import argparse
+import time
+from datetime import datetime, timezone
+
+from elasticsearch import helpers
+from tqdm import tqdm
+
+from app.db.database import SessionLocal
+from app.external.elastic import TAGS_BUILD_ALIAS, TAGS_INDEX_ALIAS, TAGS_INDEX_MAPPING, connect_to_es, get_es_client
+from app.repositories import elastic_repository, flashcard_set_repository
+
+def load_stored_tags(es) -> dict[int, list[str]]:
+    if not es.indices.exists(index=TAGS_INDEX_ALIAS):
+        return {}
+    stored_tags = {}
+    for hit in helpers.scan(es, index=TAGS_INDEX_ALIAS, _source=["set_id", "tags"], size=5000):
+        source = hit["_source"]
+        stored_tags[source["set_id"]] = source.get("tags") or []
+    return stored_tags
+
+def generate_actions(db, index_name: str, stored_tags: dict[int, list[str]], batch_size: int):
+    for set_id, name, description, is_public, created_at, email in flashcard_set_repository.stream_sets_for_indexing(db, batch_size):
+        yield {
+            # The outbox worker may already have written a newer copy of this set
+            "_op_type": "create",
+            "_index": index_name,
+            "_id": set_id,
+            "_source": elastic_repository.build_set_document(
+                set_id=set_id,
+                name=name,
+                description=description,
+                tags=stored_tags.get(set_id, []),
+                is_public=is_public,
+                creator_email=email,
+                created_at=created_at,
+            ),
+        }
+
+def swap_alias(es, new_index: str):
+    actions = [{"remove": {"index": new_index, "alias": TAGS_BUILD_ALIAS}}]
+    if es.indices.exists_alias(name=TAGS_INDEX_ALIAS):
+        for old_index in es.indices.get_alias(name=TAGS_INDEX_ALIAS):
+            actions.append({"remove": {"index": old_index, "alias": TAGS_INDEX_ALIAS}})
+    elif es.indices.exists(index=TAGS_INDEX_ALIAS):
+        # Index created before aliases were used; it has to go in the same call to free its name
+        actions.append({"remove_index": {"index": TAGS_INDEX_ALIAS}})
+    actions.append({"add": {"index": new_index, "alias": TAGS_INDEX_ALIAS}})
+    es.indices.update_aliases(actions=actions)
+    return [action["remove"]["index"] for action in actions[1:] if "remove" in action]
+
+def delete_removed_sets(es, db, index_name: str, batch_size: int) -> int:
+    # Sets deleted while the scan ran can have been created in the new index after the worker deleted them
+    indexed_ids = [int(hit["_id"]) for hit in helpers.scan(es, index=index_name, _source=False, size=5000)]
+    removed_ids = []
+    for start in range(0, len(indexed_ids), batch_size):
+        batch = indexed_ids[start:start + batch_size]
+        existing_ids = flashcard_set_repository.get_existing_set_ids(db, batch)
+        removed_ids.extend(set_id for set_id in batch if set_id not in existing_ids)
+    helpers.bulk(
+        es,
+        ({"_op_type": "delete", "_index": index_name, "_id": set_id} for set_id in removed_ids),
+        raise_on_error=False,
+        ignore_status=(404,),
+    )
+    return len(removed_ids)
+
+def reindex(batch_size: int, thread_count: int, delete_old: bool):
+    connect_to_es()
+    es = get_es_client()
+    new_index = f"{TAGS_INDEX_ALIAS}_{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+
+    stored_tags = load_stored_tags(es)
+    print(f"Loaded stored tags for {len(stored_tags)} sets")
+
+    # No refreshes or replicas while loading, restored before the index goes live
+    es.indices.create(
+        index=new_index,
+        mappings=TAGS_INDEX_MAPPING,
+        settings={"refresh_interval": "-1", "number_of_replicas": 0},
+    )
+    # From here on the outbox worker writes every change to the new index too,
+    # so nothing written through the old alias during the build is lost at the swap
+    es.indices.put_alias(index=new_index, name=TAGS_BUILD_ALIAS)
+
+    db = SessionLocal()
+    failed = 0
+    started_at = time.monotonic()
+    try:
+        total = flashcard_set_repository.count_sets(db)
+        actions = generate_actions(db, new_index, stored_tags, batch_size)
+        with tqdm(total=total, unit="docs") as progress:
+            for ok, info in helpers.parallel_bulk(
+                es,
+                actions,
+                thread_count=thread_count,
+                chunk_size=batch_size,
+                raise_on_error=False,
+            ):
+                if not ok and info.get("create", {}).get("status") != 409:
+                    failed += 1
+                    print(f"Failed to index document: {info}")
+                progress.update(1)
+    finally:
+        db.close()
+
+    elapsed = time.monotonic() - started_at
+    print(f"Indexed {total - failed} documents into {new_index} in {elapsed:.1f}s ({total / max(elapsed, 0.001):.0f} docs/s)")
+    if failed:
+        print(f"{failed} documents failed, leaving {TAGS_INDEX_ALIAS} unchanged")
+        es.indices.delete_alias(index=new_index, name=TAGS_BUILD_ALIAS)
+        return
+
+    es.indices.put_settings(index=new_index, settings={"refresh_interval": None, "number_of_replicas": None})
+    es.indices.refresh(index=new_index)
+
+    old_indices = swap_alias(es, new_index)
+    print(f"Alias {TAGS_INDEX_ALIAS} now points to {new_index}")
+
+    db = SessionLocal()
+    try:
+        removed = delete_removed_sets(es, db, new_index, batch_size)
+    finally:
+        db.close()
+    print(f"Removed {removed} sets deleted during the build")
+
+    if delete_old:
+        for old_index in old_indices:
+            es.indices.delete(index=old_index)
+            print(f"Deleted old index {old_index}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Rebuild {TAGS_INDEX_ALIAS} into a new index and swap the alias")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--delete-old", action="store_true")
+    args = parser.parse_args()
+    reindex(args.batch_size, args.threads, args.delete_old)
@@ -0,0 +1,37 @@
+import time
+
+from app.core.config import settings
+from app.core.telemetry import setup_providers
+from app.db.database import SessionLocal
+from app.external.elastic import connect_to_es
+from app.services.search_indexing_service import SearchIndexingService
+
+BACKLOG_REPORT_SECONDS = 15
+
+def run():
+    setup_providers("Flashcard_search_indexer")
+    connect_to_es()
+    service = SearchIndexingService()
+    last_backlog_report = 0.0
+    print("Search outbox worker started")
+
+    while True:
+        db = SessionLocal()
+        try:
+            processed = service.process_batch(db, settings.SEARCH_OUTBOX_BATCH_SIZE)
+            if time.monotonic() - last_backlog_report >= BACKLOG_REPORT_SECONDS:
+                service.record_backlog(db)
+                last_backlog_report = time.monotonic()
+        except Exception as e:
+            db.rollback()
+            processed = 0
+            print(f"Search outbox worker error: {e}")
+        finally:
+            db.close()
+
+        # Drain back to back while there is a backlog, otherwise poll
+        if processed < settings.SEARCH_OUTBOX_BATCH_SIZE:
+            time.sleep(settings.SEARCH_OUTBOX_POLL_SECONDS)
+
+if __name__ == "__main__":
+    run()
@@ -2,7 +2,7 @@ from sqlalchemy.orm import Session
 
 from app.api.schemas import CommentCreate, CommentOut, CommentUpdate
 from app.db.models import User, VoteTypeEnum
-from app.repositories import comment_repository, material_repository, vote_repository
+from app.repositories import comment_repository, flashcard_set_repository, material_repository, vote_repository
 from app.services.exceptions import NotFoundError, PermissionDeniedError, ValidationError
 
 class CommentService:
@@ -20,6 +20,7 @@ class CommentService:
             if parent_comment.parent_comment_id is not None:
                 raise ValidationError("You cannot make a reply to a reply")
         
+        flashcard_set_repository.bump_version(db, material_id)
         new_comment = comment_repository.create_comment(
             db, comment_data.text, user.id, material_id, comment_data.parent_comment_id
         )
@@ -43,6 +44,7 @@ class CommentService:
         if comment_to_delete.user_id != user.id:
             raise PermissionDeniedError("Not authorized to delete this comment")
         
+        flashcard_set_repository.bump_version(db, comment_to_delete.material_id)
         comment_repository.delete_comment_with_replies(db, comment_to_delete)
 
     def update_comment(self, db: Session, comment_id: int, comment_data: CommentUpdate, user: User) -> CommentOut:
@@ -52,6 +54,7 @@ class CommentService:
         if comment_to_update.user_id != user.id:
             raise PermissionDeniedError("Not authorized to update this comment")
         
+        flashcard_set_repository.bump_version(db, comment_to_update.material_id)
         updated_comment = comment_repository.update_comment(db, comment_to_update, comment_data.text)
         
         upvotes = vote_repository.get_vote_count(db, comment_id, "comment", VoteTypeEnum.upvote)
@@ -1,17 +1,26 @@
-from bs4 import BeautifulSoup
-from elasticsearch import Elasticsearch
-from fastapi import BackgroundTasks
+import hashlib
+
 from sqlalchemy.orm import Session
 
-from app.db.database import SessionLocal
-from app.api.schemas import CopySet, FlashcardData, FlashcardSetOut, FlashcardSetUpdate, FlashcardSetUpdateAndCreate, SharedUser
-from app.db.models import Material, PermissionEnum, User, VoteTypeEnum
-from app.external.gemini import generate_tags
-from app.repositories import comment_repository, elastic_repository, flashcard_set_repository, material_repository, share_repository, user_repository, vote_repository
-from app.services.exceptions import NotFoundError, PermissionDeniedError
+from app.api.schemas import CopySet, FlashcardPageOut, FlashcardSetOut, FlashcardSetUpdate, FlashcardSetUpdateAndCreate
+from app.db.models import Flashcard, Material, PermissionEnum, ShareStatusEnum, User, VoteTypeEnum
+from app.core.cache import SizedLRUCache
+from app.core.config import settings
+from app.repositories import comment_repository, flashcard_set_repository, material_repository, search_outbox_repository
+from app.services.exceptions import NotFoundError
 from app.services.material_service import MaterialService
-from opentelemetry import trace  # <--- 1. Import
-tracer = trace.get_tracer(__name__)
+from app.services.view_event_pipeline import view_event_pipeline
+
+FLASHCARD_PAGE_SIZE = 100
+MAX_FLASHCARD_PAGE_SIZE = 500
+
+set_details_cache = SizedLRUCache("set_details", settings.SET_CACHE_MAX_BYTES)
+
+def build_set_etag(set_id: int, version: int, user_id: int | None, user_vote: VoteTypeEnum | str | None) -> str:
+    if isinstance(user_vote, VoteTypeEnum):
+        user_vote = user_vote.value
+    viewer_part = hashlib.sha1(f"{user_id}:{user_vote}".encode()).hexdigest()[:12]
+    return f'W/"{set_id}-{version}-{viewer_part}"'
 
 class FlashcardSetService:
     def get_full_set_details(
@@ -19,67 +28,165 @@ class FlashcardSetService:
         db: Session,
         set_id: int,
         current_user: User | None,
+        if_none_match: str | None,
         material_service: MaterialService,
-        background_tasks: BackgroundTasks,
+        viewer_fingerprint: str | None = None,
+    ) -> tuple[FlashcardSetOut | None, str]:
+        user_id = current_user.id if current_user else None
+        # Keyed by the requested id, a link caches its target's details under its own id
+        cached_set = set_details_cache.peek(set_id)
+        set_row = flashcard_set_repository.get_set_details(
+            db,
+            set_id,
+            user_id,
+            FLASHCARD_PAGE_SIZE + 1,
+            cached_set.id if cached_set else None,
+            cached_set.version if cached_set else None,
+        )
+        if not set_row:
+            raise NotFoundError("Material not found")
+        self._authorize_set_view(set_row, current_user, material_service)
+
+        # Counted only now, a stale entry that gets rebuilt is a miss
+        is_cache_hit = cached_set is not None and (cached_set.id, cached_set.version) == (set_row["id"], set_row["version"])
+        set_details_cache.record_lookup(is_cache_hit)
+        if not is_cache_hit:
+            cached_set = self._build_shared_set_details(set_row)
+            set_details_cache.set(set_id, cached_set, size=len(cached_set.model_dump_json()))
+
+        set_id = set_row["id"]
+        view_event_pipeline.submit(
+            set_id=set_id,
+            user_id=user_id,
+            is_public=set_row["is_public"],
+            fingerprint=viewer_fingerprint,
+        )
+
+        etag = build_set_etag(set_id, set_row["version"], user_id, set_row["user_vote"])
+        if if_none_match:
+            client_etags = {tag.strip() for tag in if_none_match.split(",")}
+            if etag in client_etags or "*" in client_etags:
+                return None, etag
+
+        return self._apply_viewer_overlay(
+            cached_set,
+            current_user,
+            set_row["user_vote"],
+            set_row["comment_votes"] or {},
+        ), etag
+
+    def _build_shared_set_details(self, set_details) -> FlashcardSetOut:
+        flashcards = set_details["flashcards"]
+        next_cursor = None
+        if len(flashcards) > FLASHCARD_PAGE_SIZE:
+            flashcards = flashcards[:FLASHCARD_PAGE_SIZE]
+            next_cursor = flashcards[-1]["id"]
+
+        return FlashcardSetOut(
+            id = set_details["id"],
+            name = set_details["name"],
+            description = set_details["description"],
+            is_public = set_details["is_public"],
+            creator = set_details["creator"],
+            flashcards = flashcards,
+            flashcard_count = set_details["flashcard_count"],
+            next_cursor = next_cursor,
+            version = set_details["version"],
+            shared_with = set_details["shared_with"],
+            upvotes = set_details["upvotes"],
+            downvotes = set_details["downvotes"],
+            user_vote = None,
+            comments_data = comment_repository.build_comments_data(set_details["comments"]),
+        )
+
+    def _apply_viewer_overlay(
+        self,
+        shared_set: FlashcardSetOut,
+        current_user: User | None,
+        user_vote: str | None,
+        comment_votes: dict[str, str],
     ) -> FlashcardSetOut:
-        try:
-            set_material = material_service.check_permission(
-                db, set_id, current_user, PermissionEnum.viewer
-            )
-        except (NotFoundError, PermissionDeniedError) as e:
-            raise e
-        
-        if set_material.item_type == "link":
-            linked_id = set_material.linked_material_id
-            set_material = material_repository.get_all_materials_by_id(db, linked_id)
-            if not set_material:
-                raise NotFoundError("Original material for this link not found")
-            set_id = linked_id
-        
-        flashcard_set_model = material_repository.get_material_with_flashcards(db, set_id)
-        if not flashcard_set_model or not flashcard_set_model.flashcard_set:
+        if not current_user:
+            return shared_set.model_copy(update={"shared_with": []})
+
+        is_collaborator = current_user.email == shared_set.creator or any(
+            shared_user.user_id == current_user.id for shared_user in shared_set.shared_with
+        )
+
+        comments_data = shared_set.comments_data
+        if comments_data.comments and comment_votes:
+            # JSON object keys come back as strings
+            comment_votes = {int(comment_id): VoteTypeEnum(vote) for comment_id, vote in comment_votes.items()}
+            comments_data = comments_data.model_copy(update={
+                "comments": {
+                    comment_id: comment.model_copy(update={"user_vote": comment_votes[comment_id]})
+                    if comment_id in comment_votes else comment
+                    for comment_id, comment in comments_data.comments.items()
+                }
+            })
+
+        return shared_set.model_copy(update={
+            "user_vote": VoteTypeEnum(user_vote) if user_vote else None,
+            "shared_with": shared_set.shared_with if is_collaborator else [],
+            "comments_data": comments_data,
+        })
+
+    def _authorize_set_view(self, set_row, current_user: User | None, material_service: MaterialService):
+        viewer_permission = set_row["viewer_permission"]
+        viewer_share_status = set_row["viewer_share_status"]
+        material_service.authorize(
+            set_row["requested_owner_id"],
+            set_row["requested_is_public"],
+            PermissionEnum(viewer_permission) if viewer_permission else None,
+            ShareStatusEnum(viewer_share_status) if viewer_share_status else None,
+            current_user,
+            PermissionEnum.viewer,
+        )
+
+        if set_row["id"] is None:
+            raise NotFoundError("Original material for this link not found")
+        if not set_row["has_set"]:
             raise NotFoundError("Flashcard set data not found")
-        
-        flashcard_set = flashcard_set_model.flashcard_set
-        creator = user_repository.get_user_by_id(db, set_material.owner_id)
-        shares_data = share_repository.get_shares_for_material(db, set_id)
-        shared_with_list = [
-            SharedUser(user_id=user.id, email=user.email, permission=share.permission)
-            for share, user in shares_data
-        ]
-
-        upvotes = vote_repository.get_vote_count(db, set_id, "material", VoteTypeEnum.upvote)
-        downvotes = vote_repository.get_vote_count(db, set_id, "material", VoteTypeEnum.downvote)
-
-        user_vote = None
-        user_id_for_logs = -1
-        if current_user:
-            user_vote = vote_repository.get_user_vote_type(db, set_id, "material", current_user.id)
-            user_id_for_logs = current_user.id
-
-        comments_data = comment_repository.get_comments_for_set(db, set_id, user_id_for_logs)
-        
-        # background_tasks.add_task(
-        #     elastic_repository.log_view_event,
-        #     set_id=set_id,
-        #     user_id=user_id_for_logs,
-        # )
-        elastic_repository.log_view_event(set_id=set_id, user_id=user_id_for_logs)
 
-        return FlashcardSetOut(
-            id = set_id,
-            name = set_material.name,
-            description = flashcard_set.description,
-            is_public = flashcard_set.is_public,
-            creator = creator.email,
-            flashcards = flashcard_set.flashcards,
-            shared_with = shared_with_list,
-            upvotes = upvotes,
-            downvotes = downvotes,
-            user_vote = user_vote,
-            comments_data = comments_data,
+    def get_flashcards_page(
+        self,
+        db: Session,
+        set_id: int,
+        current_user: User | None,
+        after_id: int | None,
+        limit: int,
+        material_service: MaterialService,
+    ) -> FlashcardPageOut:
+        set_material = material_service.check_permission(
+            db, set_id, current_user, PermissionEnum.viewer
         )
-            
+        set_material = self._resolve_link(db, set_material)
+
+        flashcards, next_cursor = self._get_flashcards_page(db, set_material.id, after_id, limit)
+        return FlashcardPageOut(flashcards=flashcards, next_cursor=next_cursor)
+
+    def _resolve_link(self, db: Session, set_material: Material) -> Material:
+        if set_material.item_type != "link":
+            return set_material
+
+        linked_material = material_repository.get_all_materials_by_id(db, set_material.linked_material_id)
+        if not linked_material:
+            raise NotFoundError("Original material for this link not found")
+        return linked_material
+
+    def _get_flashcards_page(
+        self,
+        db: Session,
+        set_id: int,
+        after_id: int | None,
+        limit: int,
+    ) -> tuple[list[Flashcard], int | None]:
+        flashcards = flashcard_set_repository.get_flashcards_page(db, set_id, after_id, limit + 1)
+        if len(flashcards) <= limit:
+            return flashcards, None
+
+        flashcards = flashcards[:limit]
+        return flashcards, flashcards[-1].id
 
     def create_set(
         self,
@@ -93,8 +200,11 @@ class FlashcardSetService:
             item_type="set",
             owner_id=user.id,
             parent_id=set_data.parent_id,
+            commit=False,
         )
+        search_outbox_repository.enqueue(db, new_material.id, regenerate_tags=True)
         flashcard_set_repository.create_flashcard_set(db, new_material.id, set_data)
+        db.refresh(new_material)
         return new_material
     
     def update_set(
@@ -108,93 +218,34 @@ class FlashcardSetService:
         set_material = material_service.check_permission(db, set_id, user, PermissionEnum.editor)
 
         set_material.name = update_data.name
-        db.commit()
 
         flashcard_set = flashcard_set_repository.get_set_by_id(db, set_id)
         if not flashcard_set:
             raise NotFoundError("Flashcard set data not ofund")
         
+        # A visibility change is queued by the outbox trigger, which also rewrites is_public on view events
+        search_outbox_repository.enqueue(db, set_id, regenerate_tags=True)
         flashcard_set_repository.update_flashcard_set(db, flashcard_set, update_data)
         db.refresh(set_material)
         return set_material
     
     def copy_set(self, db: Session, set_id: int, copy_data: CopySet, user: User, material_service: MaterialService) -> Material:
         original_material = material_service.check_permission(db, set_id, user, PermissionEnum.viewer)
-        
-        original_set_full = material_repository.get_material_with_flashcards(db, original_material.id)
-        if not original_set_full or not original_set_full.flashcard_set:
-            raise NotFoundError("Flashcardset not found")
-        
-        original_set = original_set_full.flashcard_set
 
         new_material = material_repository.create_new_material(
             db=db,
             name=f"{original_material.name} (copy)",
             item_type="set",
             owner_id=user.id,
-            parent_id=copy_data.target_folder_id
-        )
-        
-        set_data = FlashcardSetUpdateAndCreate(
-            name=new_material.name,
-            description=original_set.description,
-            is_public=False,
             parent_id=copy_data.target_folder_id,
-            flashcards=[
-                FlashcardData(
-                    front_content=card.front_content,
-                    back_content=card.back_content
-                ) for card in original_set.flashcards
-            ]
+            commit=False,
         )
-        
-        flashcard_set_repository.create_flashcard_set(db, new_material.id, set_data)
-        return new_material
 
-    def generate_and_save_tags_bg(self, set_id: int, elastic_search: Elasticsearch):
-        db = SessionLocal()
-        try:
-            set_material = material_repository.get_material_with_flashcards(db, set_id)
-            if not set_material or not set_material.flashcard_set:
-                print(f"BG Task: Set {set_id} not found for tag generation.")
-                return
-
-            flashcard_set = set_material.flashcard_set
-            flashcard_content = []
-            for card in flashcard_set.flashcards:
-                front_soup = BeautifulSoup(card.front_content, "html.parser")
-                flashcard_content.append(front_soup.get_text(separator=" ", strip=True))
-                back_soup = BeautifulSoup(card.back_content, "html.parser")
-                flashcard_content.append(back_soup.get_text(separator=" ", strip=True))
-            
-            combined_content = " ".join(flashcard_content)
-
-            with tracer.start_as_current_span("gemini_generate_tags") as span:
-                span.set_attribute("content_length", len(combined_content))
-                tags = generate_tags(
-                    name=set_material.name,
-                    description=flashcard_set.description,
-                    flashcards_content=combined_content,
-                )
-
-            if not tags:
-                print(f"No tags generated for set: {set_id}")
-
-            owner = user_repository.get_user_by_id(db, set_material.owner_id)
-            
-            document = {
-                "set_id": set_id,
-                "name": set_material.name,
-                "description": flashcard_set.description,
-                "tags": tags,
-                "is_public": flashcard_set.is_public,
-                "creator_email": owner.email if owner else "Unknown",
-                "created_at": set_material.created_at,
-            }
-
-            elastic_repository.index_set_tags(set_id, document)
-
-        except Exception as e:
-            print(f"BG Task Error: {e}")
-        finally:
-            db.close()
\ No newline at end of file
+        copied_cards = flashcard_set_repository.copy_flashcard_set(db, original_material.id, new_material.id)
+        if copied_cards is None:
+            db.rollback()
+            raise NotFoundError("Flashcardset not found")
+
+        db.commit()
+        db.refresh(new_material)
+        return new_material
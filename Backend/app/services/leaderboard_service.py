@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from app.api.schemas import BasePublicSetOut, MostLikedSetsOut, MostViewedSetsOut, TimePeriod
+from app.db.database import SessionLocal
+from app.services.exceptions import ServiceError
+from app.services.public_service import PublicSetService
+
+class LeaderboardStore:
+    def __init__(self):
+        self._lock = Lock()
+        self._entries: dict[str, tuple[Any, datetime]] = {}
+
+    def get(self, key: str) -> tuple[Any, datetime] | None:
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key: str, value: Any) -> tuple[Any, datetime]:
+        entry = (value, datetime.now(timezone.utc))
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+leaderboard_store = LeaderboardStore()
+
+def _leaderboard_jobs(db: Session) -> dict[str, Callable[[], Any]]:
+    public_set_service = PublicSetService()
+    jobs = {"recently_created": lambda: public_set_service.get_recently_created(db)}
+    for period in TimePeriod:
+        jobs[f"most_viewed:{period.value}"] = lambda period=period: public_set_service.get_most_viewed(db, period)
+        jobs[f"most_liked:{period.value}"] = lambda period=period: public_set_service.get_most_liked(db, period)
+    return jobs
+
+def refresh_leaderboards():
+    db = SessionLocal()
+    try:
+        for key, compute in _leaderboard_jobs(db).items():
+            try:
+                leaderboard_store.set(key, compute())
+            except Exception as e:
+                # The previous list keeps being served until a refresh succeeds
+                db.rollback()
+                print(f"Failed to refresh leaderboard {key}: {e}")
+    finally:
+        db.close()
+
+class LeaderboardService:
+    def get_most_viewed(self, db: Session, period: TimePeriod) -> tuple[list[MostViewedSetsOut], datetime]:
+        return self._get(f"most_viewed:{period.value}", lambda: PublicSetService().get_most_viewed(db, period))
+
+    def get_most_liked(self, db: Session, period: TimePeriod) -> tuple[list[MostLikedSetsOut], datetime]:
+        return self._get(f"most_liked:{period.value}", lambda: PublicSetService().get_most_liked(db, period))
+
+    def get_recently_created(self, db: Session) -> tuple[list[BasePublicSetOut], datetime]:
+        return self._get("recently_created", lambda: PublicSetService().get_recently_created(db))
+
+    def _get(self, key: str, compute: Callable[[], Any]) -> tuple[Any, datetime]:
+        entry = leaderboard_store.get(key)
+        if entry is None:
+            # Only before the scheduler's first run
+            try:
+                entry = leaderboard_store.set(key, compute())
+            except ServiceError as e:
+                # Not stored, so the next refresh fills it as soon as the dependency is back
+                print(f"Serving empty leaderboard {key}: {e.detail}")
+                return [], datetime.now(timezone.utc)
+        return entry
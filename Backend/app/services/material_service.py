@@ -1,12 +1,17 @@
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from app.api.schemas import FolderCreate, MaterialUpdate
+from app.api.schemas import BulkActionEnum, CopySet, FolderCopyOut, FolderCreate, MaterialBulkOut, MaterialBulkRequest, MaterialBulkResult, MaterialChangesOut, MaterialOut, MaterialUpdate
 from app.db.models import Material, PermissionEnum, ShareStatusEnum, User
 from app.repositories import material_repository, share_repository
-from app.services.exceptions import NotFoundError, PermissionDeniedError, ValidationError
+from app.services.exceptions import NotFoundError, PermissionDeniedError, ServiceError, ValidationError
 
 
 class MaterialService:
+    def __init__(self):
+        # FastAPI creates one MaterialService per request, so this memo lives for a single request
+        self._permission_memo: dict[tuple[int, int | None, str], Material | ServiceError] = {}
+
     def check_permission(
         self,
         db: Session,
@@ -14,37 +19,120 @@ class MaterialService:
         user: User | None,
         req_access: PermissionEnum | str,
     ) -> Material:
-        material_info = material_repository.get_material_with_public_status(db, item_id)
-        if not material_info:
-            raise NotFoundError("Material not found")
-        
-        material, is_public = material_info
+        memo_key = self._memo_key(item_id, user, req_access)
+        if memo_key not in self._permission_memo:
+            self._load_permissions(db, [item_id], user, req_access)
+
+        result = self._permission_memo[memo_key]
+        if isinstance(result, ServiceError):
+            raise result
+        return result
+
+    def check_permissions_batch(
+        self,
+        db: Session,
+        item_ids: list[int],
+        user: User | None,
+        req_access: PermissionEnum | str,
+    ) -> dict[int, Material]:
+        unchecked_ids = [
+            item_id for item_id in set(item_ids)
+            if self._memo_key(item_id, user, req_access) not in self._permission_memo
+        ]
+        if unchecked_ids:
+            self._load_permissions(db, unchecked_ids, user, req_access)
+
+        allowed = {}
+        for item_id in item_ids:
+            result = self._permission_memo[self._memo_key(item_id, user, req_access)]
+            if not isinstance(result, ServiceError):
+                allowed[item_id] = result
+        return allowed
+
+    def _load_permissions(
+        self,
+        db: Session,
+        item_ids: list[int],
+        user: User | None,
+        req_access: PermissionEnum | str,
+    ):
+        rows = material_repository.get_materials_with_access(db, item_ids, user.id if user else None)
+
+        found_ids = set()
+        for material, is_public, share_permission, share_status in rows:
+            found_ids.add(material.id)
+            memo_key = self._memo_key(material.id, user, req_access)
+            try:
+                self.authorize(material.owner_id, bool(is_public), share_permission, share_status, user, req_access)
+                self._permission_memo[memo_key] = material
+            except PermissionDeniedError as e:
+                self._permission_memo[memo_key] = e
+
+        for item_id in set(item_ids) - found_ids:
+            self._permission_memo[self._memo_key(item_id, user, req_access)] = NotFoundError("Material not found")
+
+    def _memo_key(self, item_id: int, user: User | None, req_access: PermissionEnum | str) -> tuple[int, int | None, str]:
+        access = req_access.value if isinstance(req_access, PermissionEnum) else req_access
+        return item_id, user.id if user else None, access
+
+    def authorize(
+        self,
+        owner_id: int,
+        is_public: bool,
+        share_permission: PermissionEnum | None,
+        share_status: ShareStatusEnum | None,
+        user: User | None,
+        req_access: PermissionEnum | str,
+    ):
         if is_public and req_access == PermissionEnum.viewer:
-            return material
+            return
 
         if not user:
             raise PermissionDeniedError("Authentication required")
         
-        if material.owner_id == user.id:
-            return material
+        if owner_id == user.id:
+            return
 
         if req_access == "owner":
             raise PermissionDeniedError("Insufficient permisssion, owner required")
-        
-        share = share_repository.find_share_by_user_and_material(db, item_id, user.id)
 
-        if not share or share.status != ShareStatusEnum.accepted:
+        if not share_permission or share_status != ShareStatusEnum.accepted:
             raise PermissionDeniedError("Not authorized to acess this material")
         
-        user_permission = share.permission
-        if req_access == PermissionEnum.viewer and user_permission in [PermissionEnum.viewer, PermissionEnum.editor]:
-            return material
+        if req_access == PermissionEnum.viewer and share_permission in [PermissionEnum.viewer, PermissionEnum.editor]:
+            return
         
-        if req_access == PermissionEnum.editor and user_permission == PermissionEnum.editor:
-            return material
+        if req_access == PermissionEnum.editor and share_permission == PermissionEnum.editor:
+            return
         
         raise PermissionDeniedError("Insufficient permission")
     
+    def get_material_changes(
+        self,
+        db: Session,
+        user: User,
+        since: int | None,
+    ) -> MaterialChangesOut:
+        # Read before the changes so every transaction below the cursor is visible to them
+        cursor = material_repository.get_change_horizon(db)
+        changes = material_repository.get_material_changes(db, user.id, since, cursor)
+
+        upserts = []
+        deleted_ids = []
+        for change in changes:
+            if change["deleted"]:
+                deleted_ids.append(change["id"])
+            else:
+                upserts.append(MaterialOut(
+                    id=change["id"],
+                    item_type=change["item_type"],
+                    name=change["name"],
+                    parent_id=change["parent_id"],
+                    linked_material_id=change["linked_material_id"],
+                ))
+
+        return MaterialChangesOut(upserts=upserts, deleted_ids=deleted_ids, cursor=cursor)
+
     def create_folder(
         self,
         db: Session,
@@ -59,6 +147,49 @@ class MaterialService:
             parent_id=folder_data.parent_id,
         )
     
+    def copy_folder(
+        self,
+        db: Session,
+        folder_id: int,
+        copy_data: CopySet,
+        user: User,
+    ) -> FolderCopyOut:
+        original_folder = self.check_permission(db, folder_id, user, PermissionEnum.viewer)
+        if original_folder.item_type != "folder":
+            raise ValidationError("Only folders can be copied with their contents")
+
+        if copy_data.target_folder_id is not None:
+            target_folder = self.check_permission(db, copy_data.target_folder_id, user, "owner")
+            if target_folder.item_type != "folder":
+                raise ValidationError("Target must be a folder")
+
+        # Access is not inherited, so every node is checked and unreadable ones are left out with their subtrees
+        subtree_nodes = material_repository.get_subtree_nodes(db, original_folder.id)
+        readable = self.check_permissions_batch(
+            db, [node_id for node_id, _ in subtree_nodes], user, PermissionEnum.viewer
+        )
+        copied_ids = set()
+        for node_id, parent_id in subtree_nodes:
+            if node_id in readable and (node_id == original_folder.id or parent_id in copied_ids):
+                copied_ids.add(node_id)
+
+        copy_summary = material_repository.copy_material_subtree(
+            db,
+            root_id=original_folder.id,
+            material_ids=list(copied_ids),
+            owner_id=user.id,
+            target_parent_id=copy_data.target_folder_id,
+            root_name=f"{original_folder.name} (copy)",
+        )
+        db.commit()
+
+        new_root = material_repository.get_all_materials_by_id(db, copy_summary.pop("root_id"))
+        return FolderCopyOut(
+            root=MaterialOut.model_validate(new_root, from_attributes=True),
+            materials_skipped=len(subtree_nodes) - len(copied_ids),
+            **copy_summary,
+        )
+
     def update_material(
         self,
         db: Session,
@@ -73,9 +204,9 @@ class MaterialService:
             "owner",
         )
 
-        if "parent_id" in update_data.model_dump(exclude_unset=True):
-            if item_id == update_data.parent_id:
-                raise ValidationError("Cannot move a folder into itself")
+        if "parent_id" in update_data.model_dump(exclude_unset=True) and update_data.parent_id is not None:
+            if material_repository.is_in_subtree(db, item_id, update_data.parent_id):
+                raise ValidationError("Cannot move a folder into itself or its subfolder")
         
         return material_repository.update_material(
             db,
@@ -96,6 +227,74 @@ class MaterialService:
             "owner",
         )
 
+        deleted_ids = self._delete_without_commit(db, item_to_delete, user)
+        db.commit()
+        return deleted_ids
+
+    def bulk_update_materials(
+        self,
+        db: Session,
+        bulk_data: MaterialBulkRequest,
+        user: User,
+    ) -> MaterialBulkOut:
+        operations = bulk_data.operations
+        referenced_ids = [operation.id for operation in operations] + [
+            operation.parent_id for operation in operations
+            if operation.action == BulkActionEnum.move and operation.parent_id is not None
+        ]
+        owned = self.check_permissions_batch(db, referenced_ids, user, "owner")
+
+        moves_into_subtree = material_repository.find_moves_into_own_subtree(db, [
+            (operation.id, operation.parent_id) for operation in operations
+            if operation.action == BulkActionEnum.move and operation.parent_id is not None
+        ])
+
+        results = []
+        for operation in operations:
+            result = MaterialBulkResult(id=operation.id, action=operation.action, success=False)
+            results.append(result)
+
+            material = owned.get(operation.id)
+            if not material:
+                result.detail = "Material not found or not owned by you"
+                continue
+
+            try:
+                with db.begin_nested():
+                    if operation.action == BulkActionEnum.delete:
+                        result.deleted_ids = self._delete_without_commit(db, material, user)
+
+                    elif operation.action == BulkActionEnum.rename:
+                        if not operation.name:
+                            raise ValidationError("Name is required to rename a material")
+                        material_repository.update_material(
+                            db, material, MaterialUpdate(name=operation.name), commit=False
+                        )
+
+                    elif operation.action == BulkActionEnum.move:
+                        if operation.parent_id is not None:
+                            target_folder = owned.get(operation.parent_id)
+                            if not target_folder or target_folder.item_type != "folder":
+                                raise ValidationError("Target folder not found or not owned by you")
+                            if operation.id in moves_into_subtree:
+                                raise ValidationError("Cannot move a folder into itself or its subfolder")
+                        material_repository.update_material(
+                            db, material, MaterialUpdate(parent_id=operation.parent_id), commit=False
+                        )
+            except ServiceError as e:
+                result.detail = e.detail
+                continue
+            except SQLAlchemyError as e:
+                print(f"Bulk operation on material {operation.id} failed: {e}")
+                result.detail = "Operation conflicts with another operation in this request"
+                continue
+
+            result.success = True
+
+        db.commit()
+        return MaterialBulkOut(results=results)
+
+    def _delete_without_commit(self, db: Session, item_to_delete: Material, user: User) -> list[int]:
         if item_to_delete.item_type == "link":
             share = share_repository.find_share_by_user_and_material(
                 db, item_to_delete.linked_material_id, user.id
@@ -103,9 +302,11 @@ class MaterialService:
 
             if share:
                 share_repository.delete_share(db, share)
-            material_repository.delete_material(db, item_to_delete)
-            return [item_id]
+            material_repository.delete_material(db, item_to_delete, commit=False)
+            return [item_to_delete.id]
 
-        all_ids_to_delete = material_repository.get_all_material_child_ids(db, item_id)
-        material_repository.delete_material(db, item_to_delete)
-        return all_ids_to_delete
\ No newline at end of file
+        deleted_ids = material_repository.delete_material_subtree(db, item_to_delete.id, commit=False)
+        if not deleted_ids:
+            # Already removed, e.g. by an earlier delete of an ancestor in the same bulk request
+            raise NotFoundError("Material not found")
+        return deleted_ids
@@ -1,11 +1,46 @@
+import base64
+import binascii
+import json
 from datetime import datetime, timedelta, timezone
+from threading import Lock
+
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
 
-from app.api.schemas import BasePublicSetOut, MostLikedSetsOut, MostViewedSetsOut, PublicSetSearchOut, TimePeriod
+from app.api.schemas import BasePublicSetOut, MostLikedSetsOut, MostViewedSetsOut, PublicSetSearchHitOut, PublicSetSearchOut, PublicSetSearchPageOut, SearchSuggestionsOut, TimePeriod
+from app.core.circuit_breaker import CircuitOpenError
 from app.repositories import elastic_repository, flashcard_set_repository, material_repository
-from app.services.exceptions import ServiceError
+from app.services.exceptions import ServiceError, ValidationError
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+# First pages of head queries, keyed on (normalized query, page size)
+_search_first_page_cache = TTLCache(maxsize=1024, ttl=30)
+_search_first_page_lock = Lock()
+
+SUGGESTION_SIZE = 8
+MAX_SUGGESTION_PREFIX_LENGTH = 50
+
+_suggestion_cache = TTLCache(maxsize=4096, ttl=60)
+_suggestion_lock = Lock()
 
 
+def _normalize_search_query(text_query: str) -> str:
+    return " ".join(text_query.lower().split())
+
+def _encode_search_cursor(sort_values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(sort_values).encode()).decode()
+
+def _decode_search_cursor(cursor: str) -> list:
+    try:
+        sort_values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise ValidationError("Invalid search cursor")
+    if not isinstance(sort_values, list) or len(sort_values) != 2:
+        raise ValidationError("Invalid search cursor")
+    return sort_values
+
 def _get_cutoff_date(period: TimePeriod) -> datetime:
     now = datetime.now(timezone.utc)
     if period == TimePeriod.day:
@@ -18,15 +53,14 @@ def _get_cutoff_date(period: TimePeriod) -> datetime:
 
 class PublicSetService:
     def get_most_viewed(self, db: Session, period: TimePeriod) -> list[MostViewedSetsOut]:
-        public_set_ids = flashcard_set_repository.get_public_set_ids(db)
-        if not public_set_ids:
-            return []
-        
         cutoff_date = _get_cutoff_date(period)
         now = datetime.now(timezone.utc)
         
         try:
-            response = elastic_repository.get_most_viewed(cutoff_date, now, public_set_ids)
+            rollup_boundary = None
+            if period in (TimePeriod.month, TimePeriod.year):
+                rollup_boundary = elastic_repository.get_rollup_boundary()
+            response = elastic_repository.get_most_viewed(cutoff_date, now, rollup_boundary)
         except Exception as e:
             raise ServiceError(f"Failed to get most viewed sets: {e}")
 
@@ -34,7 +68,7 @@ class PublicSetService:
         if not buckets:
             return []
         
-        set_view_counts = {bucket["key"]: bucket["doc_count"] for bucket in buckets}
+        set_view_counts = {bucket["key"]: round(bucket["views"]["value"]) for bucket in buckets}
         set_ids = list(set_view_counts.keys())
         set_details = material_repository.get_material_details_batch(db, set_ids)
 
@@ -49,7 +83,7 @@ class PublicSetService:
             ) for id, name, description, email, created_at in set_details
         ]
         results.sort(key=lambda x: x.view_count, reverse=True)
-        return results
+        return results[:elastic_repository.MOST_VIEWED_SIZE]
 
     def get_most_liked(self, db: Session, period: TimePeriod) -> list[MostLikedSetsOut]:
         cutoff_date = _get_cutoff_date(period)
@@ -86,9 +120,9 @@ class PublicSetService:
             ) for id, name, description, created_at, email in recent_sets_data
         ]
 
-    def search_public_sets(self, text_query: str) -> list[PublicSetSearchOut]:
+    async def search_public_sets(self, text_query: str) -> list[PublicSetSearchOut]:
         try:
-            response = elastic_repository.search_public_sets(text_query)
+            response = await elastic_repository.search_public_sets(text_query)
         except Exception as e:
             raise ServiceError(f"Failed to get search: {e}")
         
@@ -103,4 +137,79 @@ class PublicSetService:
                 created_at=source["created_at"],
                 tags=source.get("tags", [])
             ))
-        return results
\ No newline at end of file
+        return results
+
+    async def search_public_sets_page(
+        self,
+        text_query: str,
+        cursor: str | None,
+        limit: int,
+    ) -> PublicSetSearchPageOut:
+        normalized_query = _normalize_search_query(text_query)
+        if not normalized_query:
+            raise ValidationError("Search query cannot be empty")
+
+        cache_key = (normalized_query, limit)
+        if cursor is None:
+            with _search_first_page_lock:
+                cached_page = _search_first_page_cache.get(cache_key)
+            if cached_page is not None:
+                return cached_page
+
+        search_after = _decode_search_cursor(cursor) if cursor else None
+        try:
+            response = await elastic_repository.search_public_sets_page(normalized_query, limit, search_after)
+        except CircuitOpenError:
+            return PublicSetSearchPageOut(results=[], total=0, total_is_lower_bound=True, degraded=True)
+        except Exception as e:
+            raise ServiceError(f"Failed to get search: {e}")
+
+        hits = response["hits"]["hits"]
+        results = []
+        for hit in hits:
+            source = hit["_source"]
+            results.append(PublicSetSearchHitOut(
+                id=source["set_id"],
+                name=source["name"],
+                description=source["description"],
+                creator=source["creator_email"],
+                created_at=source["created_at"],
+                tags=source.get("tags", []),
+                highlights=hit.get("highlight", {}),
+            ))
+
+        total = response["hits"]["total"]
+        page = PublicSetSearchPageOut(
+            results=results,
+            total=total["value"],
+            total_is_lower_bound=total["relation"] == "gte",
+            next_cursor=_encode_search_cursor(hits[-1]["sort"]) if len(hits) == limit else None,
+        )
+
+        if cursor is None:
+            with _search_first_page_lock:
+                _search_first_page_cache[cache_key] = page
+        return page
+
+    async def suggest(self, prefix: str) -> SearchSuggestionsOut:
+        normalized_prefix = _normalize_search_query(prefix)[:MAX_SUGGESTION_PREFIX_LENGTH]
+        if not normalized_prefix:
+            return SearchSuggestionsOut(suggestions=[])
+
+        with _suggestion_lock:
+            cached = _suggestion_cache.get(normalized_prefix)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await elastic_repository.suggest_public_sets(normalized_prefix, SUGGESTION_SIZE)
+        except CircuitOpenError:
+            return SearchSuggestionsOut(suggestions=[], degraded=True)
+        except Exception as e:
+            raise ServiceError(f"Failed to get suggestions: {e}")
+
+        options = response["suggest"]["set_suggest"][0]["options"]
+        suggestions = SearchSuggestionsOut(suggestions=[option["text"] for option in options])
+        with _suggestion_lock:
+            _suggestion_cache[normalized_prefix] = suggestions
+        return suggestions
@@ -0,0 +1,152 @@
+from datetime import datetime, timezone
+
+from bs4 import BeautifulSoup
+from opentelemetry import metrics, trace
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.external.gemini import generate_tags
+from app.repositories import elastic_repository, flashcard_set_repository, material_repository, search_outbox_repository
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+outbox_indexed = meter.create_counter("search_outbox.indexed", description="Sets synced to Elasticsearch")
+outbox_failed = meter.create_counter("search_outbox.failed", description="Sets whose sync will be retried")
+outbox_lag = meter.create_histogram("search_outbox.lag", unit="s", description="Time from a set change to it being indexed")
+outbox_backlog = meter.create_gauge("search_outbox.backlog", description="Outbox entries waiting to be indexed")
+outbox_oldest_age = meter.create_gauge("search_outbox.oldest_age", unit="s", description="Age of the oldest waiting outbox entry")
+
+class SearchIndexingService:
+    def process_batch(self, db: Session, batch_size: int) -> int:
+        entries = search_outbox_repository.claim_batch(db, batch_size, settings.SEARCH_OUTBOX_LEASE_SECONDS)
+        if not entries:
+            db.commit()
+            return 0
+
+        pending: dict[int, dict] = {}
+        for entry in entries:
+            set_pending = pending.setdefault(entry["set_id"], {
+                "entry_ids": [],
+                "version": 0,
+                "regenerate_tags": False,
+                "sync_view_visibility": False,
+                "created_at": entry["created_at"],
+            })
+            set_pending["entry_ids"].append(entry["id"])
+            set_pending["version"] = max(set_pending["version"], entry["id"])
+            set_pending["regenerate_tags"] |= entry["regenerate_tags"]
+            set_pending["sync_view_visibility"] |= entry["sync_view_visibility"]
+            set_pending["created_at"] = min(set_pending["created_at"], entry["created_at"])
+
+        sets = {row[0]: row for row in flashcard_set_repository.get_sets_for_indexing(db, list(pending.keys()))}
+        tag_sources = {
+            set_id: self._load_tag_source(db, set_id)
+            for set_id, set_pending in pending.items()
+            if set_pending["regenerate_tags"] and set_id in sets
+        }
+        # Gemini and ES calls below run with no transaction open; the claimed rows are leased, not locked
+        db.commit()
+
+        try:
+            stored_tags = elastic_repository.get_stored_tags(list(sets.keys()))
+        except Exception as e:
+            return self._fail_batch(db, pending, f"Failed to load stored tags: {e}")
+
+        actions = []
+        for set_id, set_pending in pending.items():
+            # Outbox ids only grow, so an older entry can never overwrite a newer document
+            action = {"_id": set_id, "version": set_pending["version"], "version_type": "external_gte"}
+            if set_id not in sets:
+                action["_op_type"] = "delete"
+            else:
+                _, name, description, is_public, created_at, email = sets[set_id]
+                tags = stored_tags.get(set_id, [])
+                if tag_sources.get(set_id):
+                    tags = self._generate_tags(set_id, *tag_sources[set_id]) or tags
+                action["_source"] = elastic_repository.build_set_document(
+                    set_id=set_id,
+                    name=name,
+                    description=description,
+                    tags=tags,
+                    is_public=is_public,
+                    creator_email=email,
+                    created_at=created_at,
+                )
+            actions.append(action)
+
+        try:
+            errors = elastic_repository.bulk_sync_sets(actions)
+        except Exception as e:
+            return self._fail_batch(db, pending, f"Bulk request failed: {e}")
+
+        failed_set_ids = {}
+        for error in errors:
+            info = next(iter(error.values()))
+            failed_set_ids[int(info["_id"])] = str(info.get("error"))
+
+        for set_id, set_pending in pending.items():
+            if not set_pending["sync_view_visibility"] or set_id not in sets or set_id in failed_set_ids:
+                continue
+            # Reads the current flag, so repeated flips settle on the latest one
+            is_public = sets[set_id][3]
+            try:
+                elastic_repository.update_view_events_visibility(set_id, is_public)
+            except Exception as e:
+                failed_set_ids[set_id] = f"Failed to update view event visibility: {e}"
+
+        now = datetime.now(timezone.utc)
+        done_entry_ids = []
+        for set_id, set_pending in pending.items():
+            if set_id in failed_set_ids:
+                search_outbox_repository.reschedule_entries(db, set_pending["entry_ids"], failed_set_ids[set_id])
+                outbox_failed.add(1)
+            else:
+                done_entry_ids.extend(set_pending["entry_ids"])
+                outbox_indexed.add(1)
+                outbox_lag.record((now - set_pending["created_at"]).total_seconds())
+        search_outbox_repository.delete_entries(db, done_entry_ids)
+        db.commit()
+        return len(entries)
+
+    def record_backlog(self, db: Session):
+        count, oldest_created_at = search_outbox_repository.get_backlog(db)
+        db.commit()
+        outbox_backlog.set(count)
+        oldest_age = (datetime.now(timezone.utc) - oldest_created_at).total_seconds() if oldest_created_at else 0
+        outbox_oldest_age.set(oldest_age)
+
+    def _fail_batch(self, db: Session, pending: dict[int, dict], error: str) -> int:
+        print(f"Search outbox batch failed: {error}")
+        entry_ids = [entry_id for set_pending in pending.values() for entry_id in set_pending["entry_ids"]]
+        search_outbox_repository.reschedule_entries(db, entry_ids, error)
+        outbox_failed.add(len(pending))
+        db.commit()
+        return 0
+
+    def _load_tag_source(self, db: Session, set_id: int) -> tuple[str, str, str] | None:
+        set_material = material_repository.get_material_with_flashcards(db, set_id)
+        if not set_material or not set_material.flashcard_set:
+            return None
+
+        flashcard_set = set_material.flashcard_set
+        flashcard_content = []
+        for card in flashcard_set.flashcards:
+            front_soup = BeautifulSoup(card.front_content, "html.parser")
+            flashcard_content.append(front_soup.get_text(separator=" ", strip=True))
+            back_soup = BeautifulSoup(card.back_content, "html.parser")
+            flashcard_content.append(back_soup.get_text(separator=" ", strip=True))
+
+        return set_material.name, flashcard_set.description, " ".join(flashcard_content)
+
+    def _generate_tags(self, set_id: int, name: str, description: str, combined_content: str) -> list[str]:
+        with tracer.start_as_current_span("gemini_generate_tags") as span:
+            span.set_attribute("content_length", len(combined_content))
+            tags = generate_tags(
+                name=name,
+                description=description,
+                flashcards_content=combined_content,
+            )
+
+        if not tags:
+            print(f"No tags generated for set: {set_id}")
+        return tags
@@ -2,7 +2,7 @@ from sqlalchemy.orm import Session
 
 from app.api.schemas import PendingShareOut, ShareData, ShareUpdateData, SharedUser
 from app.db.models import Material, ShareStatusEnum, User
-from app.repositories import material_repository, share_repository, user_repository
+from app.repositories import flashcard_set_repository, material_repository, share_repository, user_repository
 from app.services.exceptions import ConflictError, NotFoundError, ValidationError
 from app.services.material_service import MaterialService
 
@@ -21,6 +21,7 @@ class ShareService:
             raise ConflictError("This material is already shared with this user.")
         
         new_share = share_repository.create_share(db, item_id, user_to_share_with.id, share_data.permission)
+        flashcard_set_repository.bump_version(db, item_id)
         
         db.commit()
         db.refresh(new_share)
@@ -39,11 +40,13 @@ class ShareService:
             raise NotFoundError("This share doesn't exist.")
         
         share_repository.delete_share(db, share_to_delete)
+        flashcard_set_repository.bump_version(db, item_id)
         db.commit()
 
     def update_shares(self, db: Session, item_id: int, share_update_data: ShareUpdateData, user: User, material_service: MaterialService):
         material_service.check_permission(db, item_id, user, "owner")
         share_repository.update_share_permissions(db, item_id, share_update_data.updates)
+        flashcard_set_repository.bump_version(db, item_id)
         db.commit()
 
     def get_pending_shares(self, db: Session, user: User) -> list[PendingShareOut]:
@@ -89,4 +92,5 @@ class ShareService:
             raise NotFoundError("Share not found")
         
         share_repository.delete_share(db, share_to_delete)
+        flashcard_set_repository.bump_version(db, share_to_delete.material_id)
         db.commit()
\ No newline at end of file
@@ -0,0 +1,60 @@
+from sqlalchemy.orm import Session
+
+from app.api.schemas import TrendingSetsOut
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import VoteTypeEnum
+from app.repositories import trending_repository
+
+TRENDING_SIZE = 20
+UPVOTE_WEIGHT = 1.0
+VIEW_WEIGHT = 0.1
+MIN_TRENDING_SCORE = 0.01
+
+def _half_life_seconds() -> float:
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600
+
+def decay_trending_scores():
+    db = SessionLocal()
+    try:
+        trending_repository.decay_scores(db, _half_life_seconds(), MIN_TRENDING_SCORE)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to decay trending scores: {e}")
+    finally:
+        db.close()
+
+class TrendingService:
+    def record_vote(
+        self,
+        db: Session,
+        set_id: int,
+        old_vote: VoteTypeEnum | None,
+        new_vote: VoteTypeEnum | None,
+    ):
+        weight = 0.0
+        if old_vote == VoteTypeEnum.upvote:
+            weight -= UPVOTE_WEIGHT
+        if new_vote == VoteTypeEnum.upvote:
+            weight += UPVOTE_WEIGHT
+        if weight:
+            trending_repository.add_score(db, set_id, weight, _half_life_seconds())
+
+    def record_views(self, db: Session, view_counts: dict[int, float]):
+        # Sorted so concurrent flushes lock set_trending rows in the same order
+        for set_id in sorted(view_counts):
+            trending_repository.add_score(db, set_id, VIEW_WEIGHT * view_counts[set_id], _half_life_seconds())
+
+    def get_trending(self, db: Session) -> list[TrendingSetsOut]:
+        rows = trending_repository.get_trending_sets(db, _half_life_seconds(), TRENDING_SIZE)
+        return [
+            TrendingSetsOut(
+                id=id,
+                name=name,
+                description=description,
+                creator=email,
+                created_at=created_at,
+                trending_score=score
+            ) for id, name, description, email, created_at, score in rows
+        ]
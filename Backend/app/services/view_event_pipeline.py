@@ -0,0 +1,191 @@
+import hashlib
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from cachetools import TTLCache
+from opentelemetry import metrics
+
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.repositories import elastic_repository, recent_view_repository
+from app.services.trending_service import TrendingService
+
+meter = metrics.get_meter(__name__)
+deduplicated_events = meter.create_counter("view_events.deduplicated", description="Repeat views inside the dedup window")
+sampled_out_events = meter.create_counter("view_events.sampled_out", description="Anonymous views skipped by sampling")
+dropped_events = meter.create_counter("view_events.dropped", description="View events dropped because the queue was full")
+flushed_events = meter.create_counter("view_events.flushed", description="View events handed to Elasticsearch")
+flush_latency = meter.create_histogram("view_events.flush_latency", unit="s", description="Time spent writing one batch")
+
+def anonymous_fingerprint(client_host: str | None, user_agent: str | None) -> str:
+    return hashlib.sha1(f"{client_host}:{user_agent}".encode()).hexdigest()[:16]
+
+class ViewEventPipeline:
+    def __init__(
+        self,
+        max_queue_size: int,
+        batch_size: int,
+        flush_interval_seconds: float,
+        dedup_window_seconds: int,
+        dedup_max_entries: int,
+        anonymous_sample_rate: float,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.anonymous_sample_rate = anonymous_sample_rate
+        self.dropped = 0
+        self._recent_views = TTLCache(maxsize=dedup_max_entries, ttl=dedup_window_seconds)
+        self._recent_views_lock = threading.Lock()
+        self._queue: queue.Queue[dict] = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        meter.create_observable_gauge(
+            "view_events.queue_depth",
+            callbacks=[lambda options: [metrics.Observation(self._queue.qsize())]],
+            description="View events waiting to be flushed",
+        )
+
+    def submit(self, set_id: int, user_id: int | None, is_public: bool, fingerprint: str | None = None):
+        viewer_key = ("user", user_id) if user_id is not None else ("anonymous", fingerprint)
+        with self._recent_views_lock:
+            is_repeat = (viewer_key, set_id) in self._recent_views
+            self._recent_views[(viewer_key, set_id)] = True
+        if is_repeat:
+            deduplicated_events.add(1)
+            if user_id is not None:
+                # Still moves the set to the top of the user's recent list
+                self._enqueue({
+                    "user_id": user_id,
+                    "set_id": set_id,
+                    "timestamp": datetime.now(timezone.utc),
+                    "recent_only": True,
+                })
+            return
+
+        weight = 1.0
+        if user_id is None and self.anonymous_sample_rate < 1:
+            if random.random() >= self.anonymous_sample_rate:
+                sampled_out_events.add(1)
+                return
+            weight = 1 / self.anonymous_sample_rate
+
+        self._enqueue({
+            "user_id": user_id if user_id is not None else -1,
+            "set_id": set_id,
+            "is_public": is_public,
+            "weight": weight,
+            "timestamp": datetime.now(timezone.utc),
+        })
+
+    def _enqueue(self, event: dict):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Views are analytics, never worth slowing down or failing a request for
+            self.dropped += 1
+            dropped_events.add(1)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="view-event-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(remaining), self.batch_size):
+            self._flush(remaining[start:start + self.batch_size])
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._flush(batch)
+
+    def _collect_batch(self) -> list[dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.batch_size and not self._stop_event.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: list[dict]):
+        started_at = time.perf_counter()
+        view_events = [event for event in batch if not event.get("recent_only")]
+        if view_events:
+            try:
+                flushed_events.add(elastic_repository.bulk_index_view_events(
+                    [{key: value for key, value in event.items() if key != "es_retry"} for event in view_events]
+                ))
+            except CircuitOpenError:
+                self._requeue_for_es(view_events)
+            except Exception as e:
+                print(f"Error flushing {len(view_events)} view events to ES: {e}")
+
+        # Events requeued for ES were already counted in Postgres on their first flush
+        new_events = [event for event in batch if not event.get("es_retry")]
+        public_views = Counter()
+        for event in new_events:
+            if not event.get("recent_only") and event["is_public"]:
+                public_views[event["set_id"]] += event["weight"]
+        recent_views = [
+            (event["user_id"], event["set_id"], event["timestamp"])
+            for event in new_events if event["user_id"] != -1
+        ]
+
+        if public_views or recent_views:
+            db = SessionLocal()
+            try:
+                TrendingService().record_views(db, public_views)
+                recent_view_repository.upsert_recent_views(db, recent_views, settings.RECENT_SETS_PER_USER)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"Error recording views in the database: {e}")
+            finally:
+                db.close()
+
+        flush_latency.record(time.perf_counter() - started_at)
+
+    def _requeue_for_es(self, events: list[dict]):
+        # On shutdown nothing would drain the queue again
+        if self._stop_event.is_set():
+            print(f"Elasticsearch unavailable, dropping {len(events)} view events on shutdown")
+            dropped_events.add(len(events))
+            return
+        for event in events:
+            self._enqueue({**event, "es_retry": True})
+        # Back off instead of spinning on the open breaker
+        self._stop_event.wait(self.flush_interval_seconds)
+
+view_event_pipeline = ViewEventPipeline(
+    settings.VIEW_EVENT_QUEUE_SIZE,
+    settings.VIEW_EVENT_BATCH_SIZE,
+    settings.VIEW_EVENT_FLUSH_SECONDS,
+    settings.VIEW_DEDUP_WINDOW_SECONDS,
+    settings.VIEW_DEDUP_MAX_ENTRIES,
+    settings.ANONYMOUS_VIEW_SAMPLE_RATE,
+)
@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta, timezone
+
+from app.repositories import elastic_repository
+
+def rollup_view_events():
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    day = elastic_repository.get_rollup_boundary()
+    if day is None:
+        first_event = elastic_repository.get_first_view_event_time()
+        if first_event is None:
+            return
+        day = first_event.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    while day < today:
+        documents = elastic_repository.aggregate_daily_views(day)
+        if documents:
+            elastic_repository.bulk_index_daily_views(documents)
+        print(f"Rolled up {len(documents)} sets for {day:%Y-%m-%d}")
+        day += timedelta(days=1)
@@ -1,8 +1,9 @@
 from sqlalchemy.orm import Session
 
 from app.db.models import Comment, Material, User, VoteTypeEnum
-from app.repositories import vote_repository
+from app.repositories import flashcard_set_repository, vote_repository
 from app.services.exceptions import NotFoundError
+from app.services.trending_service import TrendingService
 
 class VoteService:
     def process_vote(
@@ -16,11 +17,15 @@ class VoteService:
         if votable_type == "material":
             if not db.query(Material). filter(Material.id == votable_id).first():
                 raise NotFoundError("Material not found")
+            flashcard_set_repository.bump_version(db, votable_id)
         if votable_type == "comment":
-            if not db.query(Comment). filter(Comment.id == votable_id).first():
+            comment = db.query(Comment). filter(Comment.id == votable_id).first()
+            if not comment:
                 raise NotFoundError("Comment not found")
+            flashcard_set_repository.bump_version(db, comment.material_id)
 
         existing_vote = vote_repository.find_user_vote(db, votable_id, votable_type, user.id)
+        old_user_vote = existing_vote.vote_type if existing_vote else None
         new_user_vote = None
 
         if existing_vote:
@@ -33,6 +38,9 @@ class VoteService:
             vote_repository.create_vote(db, votable_id, votable_type, vote_type, user.id)
             new_user_vote = vote_type
 
+        if votable_type == "material":
+            TrendingService().record_vote(db, votable_id, old_user_vote, new_user_vote)
+
         db.commit()
 
         upvotes = vote_repository.get_vote_count(db, votable_id, votable_type, VoteTypeEnum.upvote)
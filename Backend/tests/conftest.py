@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.db.database import engine
+
+@pytest.fixture
+def db():
+    try:
+        connection = engine.connect()
+    except OperationalError:
+        pytest.skip("Needs the PostgreSQL database with the Liquibase schema applied")
+
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
@@ -0,0 +1,48 @@
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.api.schemas import CopySet
+from app.db.models import Flashcard, FlashcardSet, Material, MaterialShare, PermissionEnum, ShareStatusEnum, User
+from app.repositories import material_repository
+from app.services.material_service import MaterialService
+
+def create_set(db: Session, owner: User, parent: Material, name: str, is_public: bool) -> Material:
+    material = Material(name=name, item_type="set", owner_id=owner.id, parent_id=parent.id)
+    db.add(material)
+    db.flush()
+    db.add(FlashcardSet(id=material.id, description=name, is_public=is_public))
+    db.add(Flashcard(set_id=material.id, front_content="front", back_content="back"))
+    db.flush()
+    return material
+
+def test_viewer_share_on_folder_does_not_copy_private_child_sets(db: Session):
+    owner = User(email=f"owner-{uuid.uuid4().hex}@example.com", password="hash")
+    viewer = User(email=f"viewer-{uuid.uuid4().hex}@example.com", password="hash")
+    db.add_all([owner, viewer])
+    db.flush()
+
+    folder = Material(name="Shared folder", item_type="folder", owner_id=owner.id)
+    db.add(folder)
+    db.flush()
+    private_set = create_set(db, owner, folder, "Private deck", is_public=False)
+    create_set(db, owner, folder, "Public deck", is_public=True)
+    db.add(MaterialShare(
+        material_id=folder.id,
+        user_id=viewer.id,
+        permission=PermissionEnum.viewer,
+        status=ShareStatusEnum.accepted,
+    ))
+    db.flush()
+
+    copy_summary = MaterialService().copy_folder(db, folder.id, CopySet(target_folder_id=None), viewer)
+
+    assert copy_summary.folders_copied == 1
+    assert copy_summary.sets_copied == 1
+    assert copy_summary.flashcards_copied == 1
+    assert copy_summary.materials_skipped == 1
+    copied_names = {
+        material.name for material in material_repository.get_all_materials_for_user(db, viewer.id)
+    }
+    assert private_set.name not in copied_names
+    assert "Public deck" in copied_names
@@ -0,0 +1,95 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.db.models import Comment, Flashcard, FlashcardSet, Material, User, Vote, VoteTypeEnum
+from app.repositories import flashcard_set_repository
+from app.services.flashcard_set_service import FlashcardSetService
+from app.services.material_service import MaterialService
+
+# The endpoint also looks the viewer up once for auth, so the service gets a single statement
+# to keep GET /sets/{id} under three round trips
+MAX_SERVICE_STATEMENTS = 1
+
+@pytest.fixture
+def public_set(db: Session):
+    owner = User(email=f"owner-{uuid.uuid4().hex}@example.com", password="hash")
+    viewer = User(email=f"viewer-{uuid.uuid4().hex}@example.com", password="hash")
+    db.add_all([owner, viewer])
+    db.flush()
+
+    material = Material(name="Deck", item_type="set", owner_id=owner.id)
+    db.add(material)
+    db.flush()
+    db.add(FlashcardSet(id=material.id, description="Description", is_public=True))
+    db.add_all([
+        Flashcard(set_id=material.id, front_content=f"front {i}", back_content=f"back {i}")
+        for i in range(3)
+    ])
+    comment = Comment(text="Nice deck", user_id=owner.id, material_id=material.id)
+    db.add(comment)
+    db.flush()
+
+    db.add_all([
+        Vote(user_id=viewer.id, votable_id=material.id, votable_type="material", vote_type=VoteTypeEnum.upvote),
+        Vote(user_id=viewer.id, votable_id=comment.id, votable_type="comment", vote_type=VoteTypeEnum.downvote),
+    ])
+    db.flush()
+    return material.id, viewer, comment.id
+
+@contextmanager
+def count_statements(db: Session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+def get_details(db: Session, set_id: int, viewer: User | None):
+    return FlashcardSetService().get_full_set_details(db, set_id, viewer, None, MaterialService())
+
+def test_logged_in_viewer_costs_one_statement_on_cache_miss_and_hit(db, public_set):
+    set_id, viewer, comment_id = public_set
+
+    with count_statements(db) as statements:
+        details, _ = get_details(db, set_id, viewer)
+    assert len(statements) <= MAX_SERVICE_STATEMENTS
+    assert len(details.flashcards) == 3
+    assert details.user_vote == VoteTypeEnum.upvote
+    assert details.comments_data.comments[comment_id].user_vote == VoteTypeEnum.downvote
+
+    with count_statements(db) as statements:
+        cached_details, _ = get_details(db, set_id, viewer)
+    assert len(statements) <= MAX_SERVICE_STATEMENTS
+    assert cached_details == details
+
+def test_anonymous_viewer_costs_one_statement(db, public_set):
+    set_id, _, comment_id = public_set
+
+    with count_statements(db) as statements:
+        details, _ = get_details(db, set_id, None)
+    assert len(statements) <= MAX_SERVICE_STATEMENTS
+    assert details.user_vote is None
+    assert details.comments_data.comments[comment_id].user_vote is None
+
+def test_version_bump_reloads_details_in_one_statement(db, public_set):
+    set_id, viewer, _ = public_set
+    get_details(db, set_id, viewer)
+
+    db.add(Flashcard(set_id=set_id, front_content="front new", back_content="back new"))
+    flashcard_set_repository.bump_version(db, set_id)
+    db.flush()
+
+    with count_statements(db) as statements:
+        details, _ = get_details(db, set_id, viewer)
+    assert len(statements) <= MAX_SERVICE_STATEMENTS
+    assert len(details.flashcards) == 4
@@ -31,10 +31,11 @@ const SearchPage = () => {
             setIsLoading(true);
             setError(null);
             try {
-                const response = await axios.post(
-                    `http://localhost:8000/public/search?text_query=${encodeURIComponent(query)}`,
+                const response = await axios.get(
+                    "http://localhost:8000/public/search",
+                    { params: { q: query } },
                 );
-                const data: SearchResult[] = response.data;
+                const data: SearchResult[] = response.data.results;
                 setResults(data);
             } catch (err) {
                 let errorMessage = "Error message";
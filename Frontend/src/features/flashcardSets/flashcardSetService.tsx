@@ -35,7 +35,17 @@ export const updateSetApi = async (
 
 export const getSetApi = async (set_id: number) => {
     const response = await axios.get(`${API_URL}/sets/${set_id}`);
-    return response.data;
+    const set = response.data;
+
+    let cursor = set.next_cursor;
+    while (cursor) {
+        const page = await axios.get(`${API_URL}/sets/${set_id}/flashcards`, {
+            params: { after: cursor },
+        });
+        set.flashcards.push(...page.data.flashcards);
+        cursor = page.data.next_cursor;
+    }
+    return set;
 };
 
 export const shareSetApi = async (